@@ -5,7 +5,7 @@ from livekit.plugins import google, cartesia, deepgram, noise_cancellation, sile
 # from livekit.plugins.turn_detector.multilingual import MultilingualModel
 import asyncio
 from dotenv import load_dotenv
-from tools import lookup_user, lookup_schedule
+from tools import lookup_user, lookup_schedule, check_room_availability, search_knowledge_base, warmup_tools
 import os
 
 
@@ -16,10 +16,16 @@ class Assistant(Agent):
     def __init__(self) -> None:
         super().__init__(
             instructions="Kamu adalah Nara, AI Agent yang berperan sebagai staf TU di Universtas Kebangsaan Republik Indonesia. Gunakan tool yang tersedia untuk membantu menjawab pertanyaan user. Jawablah hanya berdasarkan informasi yang didapat dari tool. Jika tool tidak memberikan informasi yang relevan atau data tidak ditemukan, beri tahu user bahwa informasi tersebut tidak tersedia dalam data yang kamu miliki dan jangan mengarang jawaban.",
-            tools=[lookup_user, lookup_schedule],
+            tools=[lookup_user, lookup_schedule, check_room_availability, search_knowledge_base],
         )
 
 
+def prewarm(proc: agents.JobProcess):
+    # Dijalankan sekali per proses worker sebelum menerima job: model embedding dan index
+    # sudah dimuat saat room pertama memanggil search_knowledge_base
+    warmup_tools()
+
+
 async def entrypoint(ctx: agents.JobContext):
     await ctx.connect()
 
@@ -55,4 +61,4 @@ async def entrypoint(ctx: agents.JobContext):
     # await background_audio.start(room=ctx.room, agent_session=session)
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file
@@ -1,5 +1,51 @@
 from livekit.agents import function_tool, RunContext
 import os
+import sys
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Root repo ditambahkan ke sys.path agar modul di functions/ bisa dipakai dari backend
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from functions.tracing import traced
+from functions.schedule import aquery_schedules
+from functions.room_availability import aavailability
+from functions import rag
+from functions.context_packing import pack_context, CANDIDATE_CHUNKS, CONTEXT_TOKEN_BUDGET
+
+# Retrieval (embedding + pencarian vektor) dijalankan di thread terpisah agar loop audio tidak tertahan
+_rag_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-tool")
+
+
+def warmup_tools():
+    """Memuat model embedding, vector store, data jadwal, dan index nama/ruang sekali per proses worker.
+
+    Dipanggil dari prewarm hook LiveKit (lihat backend/main.py), sebelum proses menerima
+    job, sehingga panggilan tool pertama di room baru tidak menanggung cold start.
+    Tiap komponen dimuat terpisah: jika satu gagal, yang lain tetap disiapkan, dan yang
+    gagal dimuat secara lazy pada panggilan tool pertama.
+    """
+    from functions import schedule, room_availability
+
+    for name, load in (
+        ("retrieval", rag.warmup),
+        ("jadwal", schedule.load_schedules),
+        ("index nama", schedule._get_name_indexes),
+        ("index ruang", room_availability.get_index),
+    ):
+        try:
+            load()
+        except Exception as e:
+            print(f"Error saat prewarm {name}: {e}")
+
+
+def _search_knowledge(query: str) -> list:
+    docs = rag.retrieve_context(query, k=CANDIDATE_CHUNKS)
+    blocks, _ = pack_context(docs, CONTEXT_TOKEN_BUDGET, embed_documents=rag.embed_documents)
+    return [{"source": block["source"], "content": block["content"]} for block in blocks]
 
 @function_tool()
 async def lookup_user(
@@ -11,6 +57,7 @@ async def lookup_user(
     return {"name": "John Doe", "email": "john.doe@example.com"}
 
 @function_tool
+@traced("lookup_schedule")
 async def lookup_schedule(
     context: RunContext,
     day: str = None,
@@ -19,33 +66,70 @@ async def lookup_schedule(
     start_time: str = None,
     ) -> dict:
     """Cari jadwal berdasarkan hari, mata kuliah, dosen, atau waktu mulai."""
-    import pandas as pd
-    # df = pd.read_csv('backend/data/scedule.csv')
-    df = pd.read_csv(os.path.join('backend', 'data', 'scedule.csv'))
-
-    query = {}
-    if day:
-        query['Hari'] = day.capitalize()
-    if subject:
-        query['Mata Kuliah'] = subject
-    if lecturer:
-        query['Dosen'] = lecturer
-    if start_time:
-        query['Waktu Mulai'] = start_time
-
-    if not query:
+    if not (day or subject or lecturer or start_time):
         return {"error": "Mohon berikan informasi untuk pencarian jadwal (hari, mata kuliah, dosen, atau waktu mulai)."}
 
-    filtered_schedule = df.copy()
-    for key, value in query.items():
-        if key in filtered_schedule.columns:
-            filtered_schedule = filtered_schedule[filtered_schedule[key].str.contains(value, case=False, na=False)]
-        else:
-            return {"error": f"Kolom '{key}' tidak ditemukan dalam data jadwal."}
+    try:
+        # Query SQLite berjalan di thread pool agar loop audio agent tidak tertahan
+        schedules = await aquery_schedules(day=day, subject=subject, lecturer=lecturer, start_time=start_time)
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        print(f"Error saat membaca database jadwal: {e}")
+        return {"error": "Data jadwal sedang tidak dapat diakses."}
 
-
-    if filtered_schedule.empty:
+    if not schedules:
         return {"message": "Tidak ada jadwal yang ditemukan sesuai kriteria."}
 
-    return filtered_schedule.to_dict(orient='records')
+    return schedules
+
+@function_tool
+@traced("check_room_availability")
+async def check_room_availability(
+    context: RunContext,
+    day: str = None,
+    time: str = None,
+    end_time: str = None,
+    room: str = None,
+    ) -> dict:
+    """Cek kuliah yang sedang berlangsung dan ruang yang kosong pada hari dan jam tertentu.
+
+    Args:
+        day: Nama hari ("Selasa", "besok"); kosongkan untuk hari ini.
+        time: Jam dalam format JJ:MM; kosongkan untuk saat ini.
+        end_time: Jam selesai (JJ:MM) jika yang ditanyakan rentang waktu.
+        room: Nama ruang untuk melihat jadwal dan slot kosong ruang tersebut.
+    """
+    try:
+        return await aavailability(day=day, time=time, end_time=end_time, room=room)
+    except ValueError as e:
+        return {"error": str(e)}
+    except sqlite3.Error as e:
+        print(f"Error saat membaca database jadwal: {e}")
+        return {"error": "Data jadwal sedang tidak dapat diakses."}
+
+@function_tool
+@traced("search_knowledge_base")
+async def search_knowledge_base(
+    context: RunContext,
+    query: str,
+    ) -> dict:
+    """Cari informasi kampus (akademik, administrasi, fasilitas, layanan) di basis pengetahuan.
+
+    Args:
+        query: Pertanyaan atau kata kunci yang dicari, dalam bahasa Indonesia.
+    """
+    if not query or not query.strip():
+        return {"error": "Mohon berikan pertanyaan atau kata kunci yang dicari."}
+
+    loop = asyncio.get_running_loop()
+    try:
+        documents = await loop.run_in_executor(_rag_executor, _search_knowledge, query)
+    except Exception as e:
+        print(f"Error saat mencari di basis pengetahuan: {e}")
+        return {"error": "Basis pengetahuan sedang tidak dapat diakses."}
+
+    if not documents:
+        return {"message": "Tidak ada informasi yang relevan di basis pengetahuan."}
 
+    return {"documents": documents}
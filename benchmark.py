@@ -0,0 +1,279 @@
+"""Benchmark kecepatan dan kualitas retrieval.
+
+Mengukur latensi retrieve_context (p50/p95/p99), throughput, waktu build index, memori,
+serta recall@k dan MRR terhadap set pertanyaan berlabel (eval/questions.json).
+Hasil disimpan sebagai JSON di bench_results/ agar bisa dibandingkan antar run.
+Berjalan sepenuhnya offline (model embedding harus sudah ada di cache HuggingFace).
+
+Contoh:
+    python benchmark.py                 # evaluasi index yang ada di db/
+    python benchmark.py --build -k 3    # ukur juga waktu build index dari nol
+"""
+import os
+
+# Pastikan tidak ada akses jaringan (HuggingFace Hub, telemetry Chroma)
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_PATH = os.path.join(BASE_DIR, "eval", "questions.json")
+RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+
+
+def load_questions(path: str) -> list:
+    """Memuat daftar {"question", "sources"} dari file JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    for item in questions:
+        if "source" in item and "sources" not in item:
+            item["sources"] = [item["source"]]
+    return questions
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Persentil dengan interpolasi linear dari list yang sudah terurut."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(latencies_ms: list) -> dict:
+    values = sorted(latencies_ms)
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1] if values else 0.0,
+    }
+
+
+def rss_mb() -> float:
+    """RSS proses saat ini dalam MB (Linux), fallback ke ru_maxrss."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss dalam KB di Linux, byte di macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_build(workers: int = None) -> dict:
+    """Membangun index dari nol di direktori sementara (train.py --full) dan mengukur waktunya.
+
+    Cache embedding diarahkan ke file sementara agar yang terukur adalah build dingin.
+    """
+    from functions import index_store
+
+    workdir = tempfile.mkdtemp(prefix="inara-bench-")
+    try:
+        os.symlink(os.path.join(BASE_DIR, "data"), os.path.join(workdir, "data"))
+        env = dict(os.environ, EMBEDDING_CACHE_PATH=os.path.join(workdir, "embeddings.sqlite3"))
+        command = [sys.executable, os.path.join(BASE_DIR, "train.py"), "--full"]
+        if workers:
+            command += ["--workers", str(workers)]
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            print(result.stdout[-2000:], result.stderr[-2000:])
+            raise RuntimeError("train.py gagal saat mengukur waktu build index")
+
+        snapshot_path = index_store.current_snapshot_dir(os.path.join(workdir, "db"))
+        manifest_path = os.path.join(snapshot_path, index_store.MANIFEST_FILE)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            files = json.load(f)["files"]
+        return {
+            "seconds": elapsed,
+            "files": len(files),
+            "chunks": sum(len(entry["chunk_ids"]) for entry in files.values()),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def evaluate(questions: list, k: int, repeats: int) -> dict:
+    """Mengukur latensi, throughput, dan kualitas retrieval pada index yang aktif."""
+    import functions.rag as rag
+    from functions.embeddings import get_embedding_cache
+
+    embedding_cache = get_embedding_cache()
+    rss_start = rss_mb()
+    start = time.perf_counter()
+    rag.warmup()
+    load_seconds = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    # Latensi per query dingin: cache hasil dan cache embedding dikosongkan setiap panggilan,
+    # sehingga pengulangan tidak mengukur vektor query yang tersimpan dari putaran pertama
+    latencies = []
+    first_pass = []
+    ranked_sources = []
+    for repeat in range(repeats):
+        for item in questions:
+            rag.clear_query_cache()
+            embedding_cache.clear()
+            t0 = time.perf_counter()
+            docs = rag.retrieve_context_batch([item["question"]], k=k)[0]
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            latencies.append(elapsed_ms)
+            if repeat == 0:
+                first_pass.append(elapsed_ms)
+                ranked_sources.append([doc.metadata.get("source") for doc in docs])
+
+    # Kualitas: recall@k (minimal satu sumber yang benar di top-k) dan MRR
+    hits = 0
+    reciprocal_ranks = []
+    per_question = []
+    for item, sources in zip(questions, ranked_sources):
+        expected = set(item["sources"])
+        rank = next((i + 1 for i, source in enumerate(sources) if source in expected), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        per_question.append({"question": item["question"], "expected": item["sources"],
+                             "retrieved": sources, "rank": rank})
+
+    # Throughput: berurutan (satu per satu) dan batch (retrieve_context_batch), embedding dingin
+    rag.clear_query_cache()
+    embedding_cache.clear()
+    t0 = time.perf_counter()
+    for item in questions:
+        rag.retrieve_context_batch([item["question"]], k=k)
+    sequential_seconds = time.perf_counter() - t0
+
+    rag.clear_query_cache()
+    embedding_cache.clear()
+    t0 = time.perf_counter()
+    rag.retrieve_context_batch([item["question"] for item in questions], k=k)
+    batch_seconds = time.perf_counter() - t0
+
+    # Latensi hangat: hasil sudah ada di cache query
+    cached = []
+    for item in questions:
+        t0 = time.perf_counter()
+        rag.retrieve_context_batch([item["question"]], k=k)
+        cached.append((time.perf_counter() - t0) * 1000)
+
+    n = len(questions)
+    return {
+        "load_seconds": load_seconds,
+        "latency": latency_summary(latencies),
+        "latency_first_pass": latency_summary(first_pass),
+        "latency_cached": latency_summary(cached),
+        "throughput_qps": {
+            "sequential": n / sequential_seconds if sequential_seconds > 0 else None,
+            "batch": n / batch_seconds if batch_seconds > 0 else None,
+        },
+        "quality": {
+            f"recall_at_{k}": hits / n if n else 0.0,
+            "mrr": sum(reciprocal_ranks) / n if n else 0.0,
+        },
+        "memory_mb": {
+            "rss_before_load": rss_start,
+            "rss_after_load": rss_loaded,
+            "rss_end": rss_mb(),
+            "peak_rss": peak_rss_mb(),
+        },
+        "cache_stats": rag.cache_stats(),
+        "per_question": per_question,
+    }
+
+
+def run_config() -> dict:
+    """Konfigurasi yang memengaruhi hasil, disimpan bersama hasil benchmark."""
+    import train
+    import functions.rag as rag
+    from functions.embeddings import embedding_id
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "git_commit": commit,
+        "chunk_size": train.CHUNK_SIZE,
+        "chunk_overlap": train.CHUNK_OVERLAP,
+        "embedding": embedding_id(rag.EMBEDDING_MODEL),
+        "vector_backend": rag.VECTOR_BACKEND,
+        "index_version": rag.index_version(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark kecepatan dan kualitas retrieval.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="File JSON pertanyaan berlabel")
+    parser.add_argument("-k", type=int, default=3, help="Jumlah dokumen yang diambil per query")
+    parser.add_argument("--repeats", type=int, default=5, help="Pengulangan pengukuran latensi")
+    parser.add_argument("--build", action="store_true", help="Ukur juga waktu build index dari nol")
+    parser.add_argument("--workers", type=int, default=None, help="Worker parsing untuk --build")
+    parser.add_argument("--label", default="", help="Label bebas untuk membedakan run")
+    parser.add_argument("--output", default=None, help="Path file JSON hasil")
+    args = parser.parse_args(argv)
+
+    # Cache embedding terpisah agar embedding query tidak terbawa dari run sebelumnya
+    tmp_cache = tempfile.mkdtemp(prefix="inara-bench-cache-")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(tmp_cache, "embeddings.sqlite3")
+    try:
+        questions = load_questions(args.questions)
+        report = {
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "k": args.k,
+            "n_questions": len(questions),
+            "repeats": args.repeats,
+            "config": run_config(),
+            "index_build": measure_build(args.workers) if args.build else None,
+        }
+        report.update(evaluate(questions, args.k, args.repeats))
+    finally:
+        shutil.rmtree(tmp_cache, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"retrieval-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    latency = report["latency"]
+    quality = report["quality"]
+    first_pass = report["latency_first_pass"]
+    cached = report["latency_cached"]
+    print(f"\nLatensi retrieve_context (dingin, {args.repeats}x): p50 {latency['p50_ms']:.1f} ms, "
+          f"p95 {latency['p95_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms")
+    print(f"  Putaran pertama: p50 {first_pass['p50_ms']:.1f} ms, p95 {first_pass['p95_ms']:.1f} ms; "
+          f"hangat (cache query): p50 {cached['p50_ms']:.2f} ms")
+    print(f"Throughput: {report['throughput_qps']['sequential']:.1f} q/s berurutan, "
+          f"{report['throughput_qps']['batch']:.1f} q/s batch")
+    print(f"Kualitas: recall@{args.k} {quality[f'recall_at_{args.k}']:.3f}, MRR {quality['mrr']:.3f}")
+    print(f"Memori: RSS {report['memory_mb']['rss_after_load']:.0f} MB setelah load, "
+          f"puncak {report['memory_mb']['peak_rss']:.0f} MB")
+    if report["index_build"]:
+        build = report["index_build"]
+        print(f"Build index: {build['seconds']:.1f}s untuk {build['files']} file / {build['chunks']} chunk")
+    print(f"Hasil disimpan ke: {output}")
+
+
+if __name__ == "__main__":
+    main()
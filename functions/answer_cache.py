@@ -0,0 +1,204 @@
+import os
+import re
+import time
+import array
+import sqlite3
+import threading
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# Cache jawaban LLM, persisten antar restart
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(current_dir, "..", "cache", "answers.sqlite3"))
+ANSWER_CACHE_MAX_ENTRIES = 2000
+ANSWER_CACHE_TTL = 24 * 60 * 60 # detik
+# Saat proses berpindah versi knowledge base, entri versi lain dibuang kecuali masih dipakai
+# dalam jangka ini (proses lain yang belum berpindah saat rolling swap index)
+STALE_VERSION_GRACE = 15 * 60 # detik
+# Pencocokan semantik: query lain dengan cosine >= ambang dianggap pertanyaan yang sama.
+# Mati secara default: pertanyaan yang hanya berbeda satu entitas ("jadwal senin" vs
+# "jadwal selasa", nama dosen) sering tetap di atas ambang.
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "0") == "1"
+ANSWER_CACHE_SIMILARITY = 0.92
+# Token yang harus sama persis agar hit semantik dipakai: angka, nama hari, dan nama bulan
+_ENTITY_PATTERN = re.compile(
+    r"\b(\d+|senin|selasa|rabu|kamis|jum'?at|sabtu|minggu|januari|februari|maret|april|mei|juni|juli"
+    r"|agustus|september|oktober|november|desember)\b"
+)
+
+
+def normalize_query(query: str) -> str:
+    """Normalisasi query: huruf kecil, tanda baca di ujung dibuang, spasi dirapikan."""
+    return " ".join(query.lower().split()).strip(" ?!.,")
+
+
+def entity_tokens(query_norm: str) -> set:
+    """Angka, nama hari, dan nama bulan di query yang sudah dinormalisasi."""
+    return set(_ENTITY_PATTERN.findall(query_norm))
+
+
+class AnswerCache:
+    """Cache jawaban per (query ternormalisasi, versi knowledge base) di SQLite.
+
+    Jawaban hanya pernah dikembalikan untuk versi knowledge base yang sama dengan saat
+    jawaban dibuat. Hit semantik (jika diaktifkan) juga mensyaratkan entity_tokens() kedua
+    query sama. Entri kedaluwarsa setelah TTL; jika jumlah entri melebihi batas,
+    entri yang paling lama tidak dipakai dibuang terlebih dahulu. Beberapa proses bisa
+    berbagi file yang sama pada versi berbeda, jadi entri versi lain hanya dibuang saat
+    proses ini berpindah versi dan entri itu tidak dipakai selama STALE_VERSION_GRACE.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl: float = ANSWER_CACHE_TTL, semantic: bool = ANSWER_CACHE_SEMANTIC,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.path = os.path.abspath(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._semantic_index = None # (kb_version, [query_norm], matriks ternormalisasi)
+        self._kb_version = None # Versi terakhir yang ditulis proses ini
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                query_norm TEXT NOT NULL,
+                kb_version TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                vector BLOB,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (query_norm, kb_version)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used)")
+        self._conn.commit()
+
+    def get(self, query: str, kb_version: str, embed=None):
+        """Mengembalikan jawaban yang tersimpan, atau None jika tidak ada.
+
+        embed (opsional) adalah fungsi teks -> vektor untuk pencarian semantik; hanya
+        dipanggil jika tidak ada kecocokan persis.
+        """
+        query_norm = normalize_query(query)
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT answer, created_at FROM answers WHERE query_norm = ? AND kb_version = ?",
+                    (query_norm, kb_version),
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._touch(query_norm, kb_version, now)
+                    self.stats["hits"] += 1
+                    return row[0]
+
+            if self.semantic and embed is not None:
+                match = self._semantic_lookup(kb_version, embed(query), entity_tokens(query_norm))
+                if match is not None:
+                    with self._lock:
+                        row = self._conn.execute(
+                            "SELECT answer, created_at FROM answers WHERE query_norm = ? AND kb_version = ?",
+                            (match, kb_version),
+                        ).fetchone()
+                        if row is not None and now - row[1] <= self.ttl:
+                            self._touch(match, kb_version, now)
+                            self.stats["semantic_hits"] += 1
+                            return row[0]
+        except Exception as e:
+            # Cache bersifat best-effort; kegagalan tidak boleh menggagalkan jawaban
+            print(f"Error saat membaca cache jawaban: {e}")
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, query: str, kb_version: str, answer: str, embed=None):
+        """Menyimpan jawaban untuk query pada versi knowledge base tertentu."""
+        query_norm = normalize_query(query)
+        now = time.time()
+        blob = None
+        try:
+            if self.semantic and embed is not None:
+                blob = array.array("f", embed(query)).tobytes()
+            with self._lock:
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO answers (query_norm, kb_version, answer, vector, created_at, last_used)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    (query_norm, kb_version, answer, blob, now, now),
+                )
+                if kb_version != self._kb_version:
+                    # Proses ini berpindah versi; versi lain yang masih dipakai proses lain dibiarkan
+                    self._conn.execute(
+                        "DELETE FROM answers WHERE kb_version != ? AND last_used < ?",
+                        (kb_version, now - STALE_VERSION_GRACE),
+                    )
+                    self._kb_version = kb_version
+                self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,))
+                count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+                if count > self.max_entries:
+                    self._conn.execute(
+                        """DELETE FROM answers WHERE rowid IN (
+                            SELECT rowid FROM answers ORDER BY last_used LIMIT ?
+                        )""",
+                        (count - self.max_entries,),
+                    )
+                self._conn.commit()
+                self._semantic_index = None
+        except Exception as e:
+            print(f"Error saat menulis cache jawaban: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._semantic_index = None
+
+    def _touch(self, query_norm: str, kb_version: str, now: float):
+        self._conn.execute(
+            "UPDATE answers SET last_used = ? WHERE query_norm = ? AND kb_version = ?",
+            (now, query_norm, kb_version),
+        )
+        self._conn.commit()
+
+    def _semantic_lookup(self, kb_version: str, vector, entities: set) -> str:
+        """Mencari query tersimpan paling mirip dengan entitas yang sama; mengembalikan query_norm-nya atau None."""
+        import numpy as np
+
+        with self._lock:
+            if self._semantic_index is None or self._semantic_index[0] != kb_version:
+                rows = self._conn.execute(
+                    "SELECT query_norm, vector FROM answers WHERE kb_version = ? AND vector IS NOT NULL",
+                    (kb_version,),
+                ).fetchall()
+                keys = [row[0] for row in rows]
+                matrix = np.array([np.frombuffer(row[1], dtype=np.float32) for row in rows], dtype=np.float32)
+                if len(keys):
+                    matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+                self._semantic_index = (kb_version, keys, matrix)
+            _, keys, matrix = self._semantic_index
+
+        if not keys:
+            return None
+        query = np.array(vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        scores = matrix @ query
+        for i in np.argsort(-scores):
+            if scores[i] < self.similarity_threshold:
+                break
+            if entity_tokens(keys[i]) == entities:
+                return keys[i]
+        return None
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    """Mengembalikan instance AnswerCache bersama untuk proses ini."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = AnswerCache()
+        return _shared_cache
@@ -0,0 +1,102 @@
+import re
+import os
+import json
+import math
+import heapq
+
+# Parameter standar BM25 Okapi
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Kata umum bahasa Indonesia yang tidak membantu pencarian leksikal
+STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "ini", "itu", "apa", "apakah", "siapa", "bagaimana",
+    "dengan", "untuk", "pada", "adalah", "dalam", "atau", "juga", "ada", "saya", "kamu",
+    "anda", "tentang", "tolong", "mohon", "jelaskan", "sebutkan", "the", "of", "and",
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list:
+    """Memecah teks menjadi token huruf kecil tanpa stopword."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Inverted index BM25 yang ringkas untuk chunk dokumen.
+
+    Setiap dokumen menyimpan id, teks, dan metadata sehingga hasil pencarian leksikal
+    bisa langsung dikembalikan tanpa membuka vector store.
+    """
+
+    def __init__(self, docs: list, postings: dict, k1: float = BM25_K1, b: float = BM25_B):
+        self.docs = docs # [{"id", "text", "metadata", "length"}]
+        self.postings = postings # term -> [[indeks dokumen, frekuensi], ...]
+        self.k1 = k1
+        self.b = b
+        total_length = sum(doc["length"] for doc in docs)
+        self.avgdl = total_length / len(docs) if docs else 0.0
+        n_docs = len(docs)
+        self.idf = {
+            term: math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in postings.items()
+        }
+
+    @classmethod
+    def build(cls, ids: list, texts: list, metadatas: list) -> "BM25Index":
+        """Membangun index dari daftar chunk (id, teks, metadata)."""
+        docs = []
+        postings = {}
+        for doc_index, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            tokens = tokenize(text)
+            docs.append({"id": doc_id, "text": text, "metadata": metadata or {}, "length": len(tokens)})
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append([doc_index, tf])
+        return cls(docs, postings)
+
+    def search(self, query: str, k: int = 5) -> list:
+        """Mengembalikan [(indeks dokumen, skor)] dengan skor BM25 tertinggi."""
+        if not self.docs:
+            return []
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf[term]
+            for doc_index, tf in posting:
+                length_norm = 1 - self.b + self.b * self.docs[doc_index]["length"] / (self.avgdl or 1.0)
+                score = idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+                scores[doc_index] = scores.get(doc_index, 0.0) + score
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str):
+        """Menyimpan index ke file JSON secara atomik."""
+        data = {"k1": self.k1, "b": self.b, "docs": self.docs, "postings": self.postings}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Memuat index dari file JSON yang ditulis save()."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["docs"], data["postings"], k1=data.get("k1", BM25_K1), b=data.get("b", BM25_B))
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """Menggabungkan beberapa daftar peringkat (berisi kunci) dengan RRF.
+
+    Mengembalikan daftar kunci terurut berdasarkan skor sum(1 / (k + rank)).
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
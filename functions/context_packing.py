@@ -0,0 +1,156 @@
+"""Penyusunan konteks untuk LLM dari hasil retrieval.
+
+Tahapan:
+1. Kandidat dipakai dalam urutan retrieval (hybrid BM25 + dense via RRF), sehingga hit
+   leksikal persis (kode, nama ruang, nomor peraturan) tidak tersingkir oleh cosine yang
+   rendah. Kandidat hanya dibuang jika hampir identik (kemiripan >= DUPLICATE_SIMILARITY)
+   dengan chunk yang sudah dipilih; kandidat berikutnya menggantikannya.
+2. Chunk dimasukkan berurutan sampai anggaran token habis, paling banyak MAX_CONTEXT_CHUNKS.
+3. Chunk bertetangga dari source yang sama (chunk_index berurutan) digabung dan teks
+   overlap (CHUNK_OVERLAP di train.py) dibuang.
+
+Batas jumlah chunk dan anggaran token mengikuti konteks sebelum packing (3 chunk teratas
+apa adanya), sehingga prompt tidak pernah lebih besar dari sebelumnya; kandidat tambahan
+hanya dipakai untuk menggantikan near-duplicate.
+
+Jumlah token diperkirakan dari panjang karakter, cukup untuk menjaga anggaran prompt.
+"""
+import math
+from functions.bm25 import tokenize
+
+CHARS_PER_TOKEN = 4 # Perkiraan kasar untuk teks Indonesia/Inggris
+CANDIDATE_CHUNKS = 8 # Kandidat yang diambil dari retrieval; sisanya pengganti near-duplicate
+MAX_CONTEXT_CHUNKS = 3 # Sama dengan top-k lama, jadi konteks tidak lebih besar dari sebelumnya
+BASELINE_CHUNK_CHARS = 500 # CHUNK_SIZE di train.py
+CONTEXT_TOKEN_BUDGET = math.ceil(MAX_CONTEXT_CHUNKS * BASELINE_CHUNK_CHARS / CHARS_PER_TOKEN)
+DUPLICATE_SIMILARITY = 0.95 # Chunk dengan kemiripan di atas ini dianggap duplikat
+MIN_OVERLAP_CHARS = 8
+MAX_OVERLAP_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def _pairwise_similarity(texts: list, embed_documents=None) -> list:
+    """Matriks kemiripan antar teks.
+
+    Memakai embedding jika embed_documents diberikan (chunk yang sudah di-index ada di
+    cache embedding), dan kemiripan token Jaccard jika tidak ada atau gagal.
+    """
+    if embed_documents is not None:
+        try:
+            import numpy as np
+
+            matrix = np.asarray(embed_documents(texts), dtype=np.float32)
+            matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+            return (matrix @ matrix.T).tolist()
+        except Exception as e:
+            print(f"Error saat embedding untuk deduplikasi, memakai kemiripan token: {e}")
+
+    token_sets = [set(tokenize(text)) for text in texts]
+    return [[_jaccard(a, b) for b in token_sets] for a in token_sets]
+
+
+def dedup_order(pairwise: list, duplicate_similarity: float = DUPLICATE_SIMILARITY) -> list:
+    """Indeks kandidat dalam urutan retrieval, tanpa yang hampir identik dengan kandidat sebelumnya."""
+    selected = []
+    for i in range(len(pairwise)):
+        if any(pairwise[i][j] >= duplicate_similarity for j in selected):
+            continue
+        selected.append(i)
+    return selected
+
+
+def strip_overlap(previous: str, text: str, max_overlap: int = MAX_OVERLAP_CHARS) -> str:
+    """Membuang awalan text yang sama dengan akhiran previous (overlap antar chunk)."""
+    limit = min(len(previous), len(text), max_overlap)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:]
+    return text
+
+
+def merge_adjacent(docs: list) -> list:
+    """Menggabungkan chunk bertetangga dari source yang sama menjadi satu blok.
+
+    Blok diurutkan menurut posisi chunk pertamanya di daftar masukan (urutan retrieval).
+    Mengembalikan [{"source", "content", "chunks"}].
+    """
+    by_source = {}
+    for position, doc in enumerate(docs):
+        source = doc.metadata.get("source", "N/A")
+        by_source.setdefault(source, []).append((doc.metadata.get("chunk_index"), position, doc.page_content))
+
+    blocks = []
+    for source, items in by_source.items():
+        if any(index is None for index, _, _ in items):
+            # Index lama tanpa chunk_index: tidak bisa tahu mana yang bertetangga
+            blocks.extend((position, {"source": source, "content": text, "chunks": 1})
+                          for _, position, text in items)
+            continue
+        items.sort()
+        current = None
+        for index, position, text in items:
+            if current is not None and index == current["last_index"] + 1:
+                addition = strip_overlap(current["content"], text)
+                separator = "" if len(addition) < len(text) else "\n"
+                current["content"] += separator + addition
+                current["chunks"] += 1
+                current["last_index"] = index
+                current["position"] = min(current["position"], position)
+            else:
+                if current is not None:
+                    blocks.append((current.pop("position"), _block(current)))
+                current = {"source": source, "content": text, "chunks": 1, "last_index": index, "position": position}
+        blocks.append((current.pop("position"), _block(current)))
+    return [block for _, block in sorted(blocks, key=lambda item: item[0])]
+
+
+def _block(current: dict) -> dict:
+    return {"source": current["source"], "content": current["content"], "chunks": current["chunks"]}
+
+
+def pack_context(docs: list, token_budget: int = CONTEXT_TOKEN_BUDGET, embed_documents=None,
+                 max_chunks: int = MAX_CONTEXT_CHUNKS) -> tuple:
+    """Menyusun konteks dari Document hasil retrieval (urut relevansi) dalam batas token_budget dan max_chunks.
+
+    Mengembalikan (blok [{"source", "content", "chunks"}], statistik). Statistik berisi
+    raw_tokens (yang dulu dikirim tanpa packing: max_chunks chunk teratas apa adanya),
+    packed_tokens, tokens_saved (raw_tokens - packed_tokens, bisa negatif), dan jumlah
+    chunk masuk/terpakai.
+    """
+    raw_tokens = sum(estimate_tokens(doc.page_content) for doc in docs[:max_chunks])
+    if not docs:
+        return [], {"chunks_in": 0, "chunks_used": 0, "raw_tokens": 0, "packed_tokens": 0, "tokens_saved": 0}
+
+    pairwise = _pairwise_similarity([doc.page_content for doc in docs], embed_documents)
+    chosen = []
+    used_tokens = 0
+    for i in dedup_order(pairwise):
+        if len(chosen) >= max_chunks:
+            break
+        cost = estimate_tokens(docs[i].page_content)
+        if chosen and used_tokens + cost > token_budget:
+            continue
+        chosen.append(docs[i])
+        used_tokens += cost
+
+    blocks = merge_adjacent(chosen)
+    # Chunk pertama selalu dipakai; potong jika sendirian sudah melebihi anggaran
+    max_chars = token_budget * CHARS_PER_TOKEN
+    for block in blocks:
+        if len(block["content"]) > max_chars:
+            block["content"] = block["content"][:max_chars]
+    packed_tokens = sum(estimate_tokens(block["content"]) for block in blocks)
+    return blocks, {
+        "chunks_in": len(docs),
+        "chunks_used": len(chosen),
+        "raw_tokens": raw_tokens,
+        "packed_tokens": packed_tokens,
+        "tokens_saved": raw_tokens - packed_tokens,
+    }
@@ -0,0 +1,188 @@
+import os
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+from langchain_core.embeddings import Embeddings
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# Cache embedding dipakai bersama oleh train.py dan functions/rag.py
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(current_dir, "..", "cache", "embeddings.sqlite3"))
+CACHE_MAX_ENTRIES = 200_000 # Batas jumlah vektor; entri yang paling lama tidak dipakai dibuang dulu
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Backend embedding: "torch" (sentence-transformers/PyTorch) atau "onnx" (ONNX int8 di CPU,
+# lihat functions/onnx_embeddings.py). Dipakai bersama oleh train.py dan functions/rag.py.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
+
+def text_key(text: str) -> str:
+    """Hash konten teks, dipakai sebagai kunci cache."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache embedding persisten di SQLite dengan kunci (nama model, hash teks).
+
+    Vektor disimpan sebagai blob float32. Jika jumlah entri melebihi max_entries,
+    entri dengan last_used paling lama dihapus hingga tersisa 90% kapasitas.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = os.path.abspath(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, keys: list) -> dict:
+        """Mengembalikan {text_hash: vektor} untuk kunci yang ada di cache."""
+        found = {}
+        if not keys:
+            return found
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Batasi jumlah parameter per query agar aman untuk batas SQLite
+            for i in range(0, len(unique_keys), 500):
+                part = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array.array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, items: dict):
+        """Menyimpan {text_hash: vektor} ke cache lalu menjalankan eviction bila perlu."""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (model, text_hash, array.array("f", vector).tobytes(), now)
+            for text_hash, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Membuang entri yang paling lama tidak dipakai hingga 90% kapasitas."""
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._conn.execute(
+            """DELETE FROM embeddings WHERE (model, text_hash) IN (
+                SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?
+            )""",
+            (excess,),
+        )
+        self._count -= excess
+
+    def clear(self):
+        """Mengosongkan seluruh cache (dipakai benchmark untuk mengukur embedding dingin)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class CachedEmbeddings(Embeddings):
+    """Pembungkus Embeddings LangChain yang membaca/menulis EmbeddingCache.
+
+    Hanya teks yang belum ada di cache yang dikirim ke model, dalam satu batch.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: list) -> list:
+        keys = [text_key(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_name, computed)
+            cached.update(computed)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> list:
+        key = text_key(text)
+        cached = self.cache.get_many(self.model_name, [key])
+        if key in cached:
+            return cached[key]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.model_name, {key: vector})
+        return vector
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Mengembalikan instance EmbeddingCache bersama untuk proses ini."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+def embedding_id(model_name: str = EMBEDDING_MODEL, backend: str = None) -> str:
+    """Identitas model + backend; vektor dari backend berbeda tidak dicampur di cache."""
+    backend = backend or EMBEDDING_BACKEND
+    return model_name if backend == "torch" else f"{model_name}@{backend}-int8"
+
+def get_embeddings(model_name: str = EMBEDDING_MODEL, backend: str = None) -> Embeddings:
+    """Membuat embedding function sesuai EMBEDDING_BACKEND yang transparan memakai cache di disk."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx":
+        from functions.onnx_embeddings import OnnxEmbeddings
+
+        base = OnnxEmbeddings(model_name)
+    elif backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        base = HuggingFaceEmbeddings(model_name=model_name)
+    else:
+        raise ValueError(f"EMBEDDING_BACKEND tidak dikenal: '{backend}' (pilihan: torch, onnx)")
+    return CachedEmbeddings(base, embedding_id(model_name, backend), get_embedding_cache())
@@ -0,0 +1,195 @@
+"""Index vektor flat berbasis NumPy sebagai alternatif Chroma untuk korpus kecil.
+
+train.py mengekspor matriks float32 ternormalisasi L2 (embeddings.npy) beserta tabel
+teks/metadata chunk (chunks.json). FlatIndex memuat matriks dengan memory-map dan
+menjawab top-k dengan satu perkalian matriks-vektor plus argpartition.
+
+Benchmark terhadap Chroma (latensi pencarian dan RSS):
+    python -m functions.flat_index bench
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+from functions import index_store
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, "..", "db")
+MATRIX_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+
+def current_flat_path() -> str:
+    """Direktori index flat di snapshot yang sedang aktif."""
+    return os.path.join(index_store.current_snapshot_dir(DB_PATH), index_store.FLAT_DIR)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+def export_flat_index(directory: str, ids: list, vectors: list, texts: list, metadatas: list):
+    """Menyimpan matriks embedding ternormalisasi dan tabel chunk secara atomik."""
+    os.makedirs(directory, exist_ok=True)
+    matrix = _normalize(np.ascontiguousarray(np.asarray(vectors, dtype=np.float32)))
+
+    tmp_matrix = os.path.join(directory, MATRIX_FILE + ".tmp")
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, matrix)
+    tmp_chunks = os.path.join(directory, CHUNKS_FILE + ".tmp")
+    with open(tmp_chunks, "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "texts": texts, "metadatas": [m or {} for m in metadatas]}, f, ensure_ascii=False)
+    os.replace(tmp_matrix, os.path.join(directory, MATRIX_FILE))
+    os.replace(tmp_chunks, os.path.join(directory, CHUNKS_FILE))
+
+
+class FlatIndex:
+    """Pencarian cosine brute-force di atas matriks float32 yang di-memory-map."""
+
+    def __init__(self, directory: str = None):
+        directory = directory or current_flat_path()
+        self.directory = directory
+        self.matrix = np.load(os.path.join(directory, MATRIX_FILE), mmap_mode="r")
+        with open(os.path.join(directory, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        self.ids = chunks["ids"]
+        self.texts = chunks["texts"]
+        self.metadatas = chunks["metadatas"]
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def search(self, query_vectors, k: int) -> list:
+        """Mengembalikan [(indeks, skor)] top-k per query, diurutkan dari skor tertinggi."""
+        n = len(self)
+        if n == 0:
+            return [[] for _ in query_vectors]
+        queries = _normalize(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        scores = queries @ self.matrix.T if len(queries) > 1 else (self.matrix @ queries[0])[None, :]
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n), (len(queries), n))
+        results = []
+        for row, candidates in zip(scores, top):
+            order = candidates[np.argsort(-row[candidates])]
+            results.append([(int(i), float(row[i])) for i in order])
+        return results
+
+    def search_documents(self, query_vectors, k: int) -> list:
+        """Seperti search(), tetapi mengembalikan Document LangChain per query."""
+        from langchain_core.documents import Document
+
+        return [
+            [
+                Document(page_content=self.texts[i], metadata=dict(self.metadatas[i]), id=self.ids[i])
+                for i, _ in hits
+            ]
+            for hits in self.search(query_vectors, k)
+        ]
+
+
+def _rss_mb() -> float:
+    """RSS proses saat ini dalam MB (Linux), fallback ke ru_maxrss."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _bench_one(backend: str, n_queries: int, k: int) -> dict:
+    """Mengukur waktu muat, latensi pencarian, dan RSS satu backend di proses ini.
+
+    Vektor query diambil dari matriks flat (ditambah noise) agar model embedding tidak
+    perlu dimuat; yang diukur murni biaya pencarian vector store.
+    """
+    rng = np.random.default_rng(0)
+    flat_path = current_flat_path()
+    reference = np.load(os.path.join(flat_path, MATRIX_FILE))
+    picks = reference[rng.integers(0, len(reference), n_queries)]
+    queries = _normalize(picks + rng.normal(0, 0.05, picks.shape).astype(np.float32))
+    del reference
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if backend == "flat":
+        index = FlatIndex(flat_path)
+        search = lambda q: index.search([q], k)
+    else:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=index_store.current_snapshot_dir(DB_PATH))
+        collection = client.get_collection("langchain")
+        search = lambda q: collection.query(query_embeddings=[q.tolist()], n_results=k)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    search(queries[0]) # pemanasan
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        search(q)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    latencies.sort()
+    return {
+        "backend": backend,
+        "load_ms": load_ms,
+        "p50_us": latencies[len(latencies) // 2],
+        "p95_us": latencies[int(len(latencies) * 0.95) - 1],
+        "mean_us": sum(latencies) / len(latencies),
+        "rss_delta_mb": _rss_mb() - rss_before,
+    }
+
+
+def bench(n_queries: int = 500, k: int = 5):
+    """Membandingkan backend flat dan Chroma, masing-masing di subprocess terpisah."""
+    rows = []
+    for backend in ("flat", "chroma"):
+        result = subprocess.run(
+            [sys.executable, "-m", "functions.flat_index", "bench-one", "--backend", backend,
+             "--queries", str(n_queries), "-k", str(k)],
+            capture_output=True, text=True, cwd=os.path.join(current_dir, ".."),
+        )
+        if result.returncode != 0:
+            print(f"Benchmark {backend} gagal:\n{result.stderr}")
+            continue
+        rows.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'backend':<8} {'load (ms)':>10} {'p50 (us)':>10} {'p95 (us)':>10} {'RSS +MB':>9}")
+    for row in rows:
+        print(f"{row['backend']:<8} {row['load_ms']:>10.1f} {row['p50_us']:>10.1f} "
+              f"{row['p95_us']:>10.1f} {row['rss_delta_mb']:>9.1f}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark index flat NumPy vs Chroma.")
+    parser.add_argument("command", choices=["bench", "bench-one"])
+    parser.add_argument("--backend", choices=["flat", "chroma"], default="flat")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(current_flat_path(), MATRIX_FILE)):
+        print("Index flat belum ada. Jalankan 'python train.py --export-flat' terlebih dahulu.")
+        return 1
+    if args.command == "bench":
+        bench(args.queries, args.k)
+    else:
+        print(json.dumps(_bench_one(args.backend, args.queries, args.k)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Tata letak index berversi: snapshot immutable dan pointer CURRENT.
+
+    db/
+    ├── CURRENT                 nama snapshot aktif (diganti atomik dengan os.replace)
+    └── snapshots/
+        └── <versi>/            Chroma, manifest.json, bm25.json, flat/ milik satu build
+
+train.py selalu menulis ke snapshot baru lalu memindahkan CURRENT; snapshot yang sedang
+dibaca proses lain tidak pernah diubah. functions/rag.py membaca CURRENT (dengan cache
+stat) dan memuat snapshot baru saat versinya berubah.
+
+Layout lama (Chroma langsung di db/ dengan penanda db/index_version) tetap terbaca
+selama CURRENT belum ada.
+"""
+import os
+import time
+import uuid
+import shutil
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(current_dir, "..", "db")
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+LEGACY_VERSION_FILE = "index_version"
+MANIFEST_FILE = "manifest.json"
+BM25_FILE = "bm25.json"
+FLAT_DIR = "flat"
+KEEP_SNAPSHOTS = 3 # Snapshot lama disimpan sebentar untuk proses yang belum berpindah
+
+_version_cache = {} # path -> (stat, nilai)
+
+
+def _read_cached(path: str) -> str:
+    """Isi file kecil, dibaca ulang hanya jika mtime/ukurannya berubah; "" jika tidak ada."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        _version_cache.pop(path, None)
+        return ""
+    stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _version_cache.get(path)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            value = f.read().strip()
+    except OSError:
+        return cached[1] if cached else ""
+    _version_cache[path] = (stat_key, value)
+    return value
+
+
+def current_version(db_path: str = DB_PATH) -> str:
+    """Nama snapshot aktif; untuk layout lama, isi db/index_version; "" jika belum ada index."""
+    version = _read_cached(os.path.join(db_path, CURRENT_FILE))
+    if version:
+        return version
+    return _read_cached(os.path.join(db_path, LEGACY_VERSION_FILE))
+
+
+def has_snapshots(db_path: str = DB_PATH) -> bool:
+    return bool(_read_cached(os.path.join(db_path, CURRENT_FILE)))
+
+
+def snapshot_dir(version: str, db_path: str = DB_PATH) -> str:
+    """Direktori snapshot untuk versi tertentu (db_path sendiri untuk layout lama)."""
+    if not has_snapshots(db_path):
+        return db_path
+    return os.path.join(db_path, SNAPSHOTS_DIR, version)
+
+
+def current_snapshot_dir(db_path: str = DB_PATH) -> str:
+    return snapshot_dir(current_version(db_path), db_path)
+
+
+def new_version() -> str:
+    """Nama snapshot baru; awalan waktu membuat urutan nama sama dengan urutan build."""
+    now = time.time()
+    return f"{time.strftime('%Y%m%d%H%M%S', time.localtime(now))}{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}"
+
+
+def create_snapshot(db_path: str = DB_PATH, copy_from: str = None) -> tuple:
+    """Membuat direktori snapshot baru (opsional salinan snapshot lain); mengembalikan (versi, path)."""
+    version = new_version()
+    path = os.path.join(db_path, SNAPSHOTS_DIR, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if copy_from:
+        shutil.copytree(copy_from, path)
+    else:
+        os.makedirs(path)
+    return version, path
+
+
+def publish(version: str, db_path: str = DB_PATH):
+    """Menjadikan snapshot versi ini aktif dengan mengganti CURRENT secara atomik."""
+    current_path = os.path.join(db_path, CURRENT_FILE)
+    tmp_path = f"{current_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, current_path)
+
+
+def prune(db_path: str = DB_PATH, keep: int = KEEP_SNAPSHOTS) -> list:
+    """Menghapus snapshot lama selain `keep` terbaru (snapshot aktif tidak pernah dihapus)."""
+    root = os.path.join(db_path, SNAPSHOTS_DIR)
+    if not os.path.isdir(root):
+        return []
+    current = current_version(db_path)
+    versions = sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+    removed = []
+    for version in versions[:-keep] if keep > 0 else versions:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+            removed.append(version)
+    return removed
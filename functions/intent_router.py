@@ -0,0 +1,182 @@
+"""Router intent lokal: sapaan, waktu, dan jadwal dijawab tanpa memanggil LLM.
+
+Klasifikasi dua tahap:
+1. Aturan kata kunci (mikrodetik), berlaku juga sebelum model embedding selesai dimuat.
+2. Nearest-centroid di atas embedding MiniLM (model yang sama dengan retrieval) dari
+   contoh ucapan per intent. Centroid dihitung sekali per proses; embedding contoh dan
+   query memakai cache embedding di disk. Intent lokal hanya dipakai jika skor cosine
+   melewati ambang dan cukup jauh di atas intent lain.
+
+Hanya pertanyaan terbuka (intent "open") yang diteruskan ke LLM.
+"""
+import re
+import time
+import sqlite3
+import threading
+from functions import rag
+from functions.schedule import find_schedules, format_schedules, load_schedules, parse_day
+from functions.time_utils import get_current_time
+from functions.tracing import observe
+
+# Contoh ucapan per intent; "open" mewakili pertanyaan informasi kampus yang butuh LLM/RAG
+INTENT_EXAMPLES = {
+    "greeting": [
+        "halo", "hai nara", "hi", "selamat pagi", "selamat siang", "selamat sore",
+        "selamat malam", "assalamualaikum", "halo apa kabar", "permisi",
+    ],
+    "time": [
+        "jam berapa sekarang", "sekarang jam berapa", "waktu sekarang", "hari ini tanggal berapa",
+        "sekarang hari apa", "tanggal berapa hari ini", "pukul berapa sekarang", "bulan apa sekarang",
+    ],
+    "schedule": [
+        "jadwal kuliah hari senin", "jadwal kuliah besok", "kapan kuliah basis data",
+        "jam berapa kelas pemrograman web", "di ruang mana kuliah sistem operasi",
+        "siapa dosen jaringan komputer", "jadwal mengajar dosen", "kuliah hari ini apa saja",
+        "mata kuliah hari jumat", "jadwal kelas kecerdasan buatan",
+    ],
+    "open": [
+        "bagaimana cara mendaftar mahasiswa baru", "berapa biaya kuliah per semester",
+        "apa saja syarat cuti akademik", "di mana letak kantor tata usaha",
+        "bagaimana prosedur pengajuan beasiswa", "apa visi dan misi kampus",
+        "program studi apa saja yang tersedia", "bagaimana cara mengurus surat keterangan aktif kuliah",
+        "kapan batas pembayaran ukt", "apa itu kartu rencana studi",
+    ],
+}
+LOCAL_INTENTS = ("greeting", "time", "schedule")
+INTENT_THRESHOLD = 0.55 # Cosine minimum ke centroid intent
+INTENT_MARGIN = 0.05 # Selisih minimum terhadap intent terbaik kedua
+
+SAPAAN = ["halo", "hai", "hi", "selamat pagi", "selamat siang", "selamat sore", "selamat malam"]
+POLA_WAKTU = re.compile(r"(jam berapa|waktu sekarang|tanggal berapa|hari apa)")
+POLA_JADWAL = re.compile(r"\bjadwal (kuliah|kelas|mengajar|dosen|matkul|mata kuliah)\b")
+POLA_KULIAH = re.compile(r"\b(kuliah|kelas|matkul)\b")
+# Isyarat jadwal yang harus menyertai nama mata kuliah: "apa itu basis data" bukan pertanyaan jadwal
+POLA_ISYARAT_JADWAL = re.compile(r"\b(kapan|jam|pukul|ruang|ruangan|dosen|pengajar|\d{1,2}[:.]\d{2})\b")
+
+_centroids = {"intents": None, "matrix": None}
+_centroid_lock = threading.Lock()
+
+
+def _mentions_schedule_entry(query: str) -> bool:
+    """True jika query menyebut nama mata kuliah yang ada di tabel jadwal, utuh per kata.
+
+    Database jadwal yang rusak atau tanpa tabel dianggap tidak cocok, sehingga query
+    tetap diklasifikasi dengan aturan lain atau diteruskan ke LLM.
+    """
+    try:
+        rows = load_schedules()
+    except sqlite3.Error as e:
+        print(f"Error saat membaca jadwal untuk router intent: {e}")
+        return False
+    return any(re.search(rf"\b{re.escape(row['class_name'].lower())}\b", query) for row in rows)
+
+
+def classify_rules(query: str) -> str:
+    """Klasifikasi dengan aturan kata kunci; None jika tidak ada aturan yang cocok."""
+    words = query.split()
+    if any(s in words or (" " in s and s in query) for s in SAPAAN) and len(words) <= 3:
+        return "greeting"
+    # Jadwal dicek sebelum waktu: "kuliah basis data hari apa" adalah pertanyaan jadwal
+    has_cue = POLA_KULIAH.search(query) or POLA_ISYARAT_JADWAL.search(query) or parse_day(query)
+    if (POLA_JADWAL.search(query) or (POLA_KULIAH.search(query) and parse_day(query))
+            or (has_cue and _mentions_schedule_entry(query))):
+        return "schedule"
+    if POLA_WAKTU.search(query):
+        return "time"
+    return None
+
+
+def _get_centroids():
+    """Menghitung centroid ternormalisasi per intent dari embedding contoh ucapan (sekali saja)."""
+    import numpy as np
+
+    with _centroid_lock:
+        if _centroids["matrix"] is None:
+            intents = list(INTENT_EXAMPLES)
+            rows = []
+            for intent in intents:
+                vectors = np.asarray(rag.embed_documents(INTENT_EXAMPLES[intent]), dtype=np.float32)
+                vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+                centroid = vectors.mean(axis=0)
+                rows.append(centroid / max(float(np.linalg.norm(centroid)), 1e-12))
+            _centroids["intents"], _centroids["matrix"] = intents, np.stack(rows)
+        return _centroids["intents"], _centroids["matrix"]
+
+
+def classify_embedding(query: str) -> tuple:
+    """Nearest-centroid di ruang embedding; mengembalikan (intent, skor).
+
+    Intent "open" dikembalikan jika skor di bawah ambang atau selisihnya terlalu tipis.
+    """
+    import numpy as np
+
+    intents, matrix = _get_centroids()
+    vector = np.asarray(rag.embed_query(query), dtype=np.float32)
+    vector /= max(float(np.linalg.norm(vector)), 1e-12)
+    scores = matrix @ vector
+    order = np.argsort(-scores)
+    best, second = int(order[0]), int(order[1])
+    score = float(scores[best])
+    if score < INTENT_THRESHOLD or score - float(scores[second]) < INTENT_MARGIN:
+        return "open", score
+    return intents[best], score
+
+
+def classify(query: str) -> tuple:
+    """Mengembalikan (intent, skor, metode) untuk query.
+
+    Tahap embedding hanya dijalankan jika model sudah dimuat, agar router tidak pernah
+    menunggu pemuatan model; sebelum itu query yang tidak cocok aturan dianggap "open".
+    """
+    query = " ".join(query.lower().split())
+    intent = classify_rules(query)
+    if intent:
+        return intent, 1.0, "rules"
+    if rag.is_ready():
+        try:
+            intent, score = classify_embedding(query)
+            return intent, score, "embedding"
+        except Exception as e:
+            print(f"Error saat klasifikasi intent: {e}")
+    return "open", 0.0, "default"
+
+
+def handle_greeting(query: str) -> str:
+    return "Halo! Ada yang bisa saya bantu terkait informasi kampus atau waktu saat ini?"
+
+
+def handle_time(query: str) -> str:
+    return f"Sekarang pukul {get_current_time()}."
+
+
+def handle_schedule(query: str) -> str:
+    return format_schedules(*find_schedules(query))
+
+
+INTENT_HANDLERS = {
+    "greeting": handle_greeting,
+    "time": handle_time,
+    "schedule": handle_schedule,
+}
+
+
+def route(query: str, metrics: dict = None) -> str:
+    """Menjawab query secara lokal jika intent-nya dikenali; None berarti teruskan ke LLM.
+
+    Jika metrics (dict) diberikan, diisi dengan intent, score, method, dan seconds.
+    """
+    start = time.perf_counter()
+    intent, score, method = classify(query)
+    answer = None
+    if intent in LOCAL_INTENTS:
+        try:
+            answer = INTENT_HANDLERS[intent](query)
+        except Exception as e:
+            # Gagal dijawab lokal (misalnya database jadwal tidak ada): biarkan LLM menjawab
+            print(f"Error saat menjawab intent {intent}: {e}")
+            intent = "open"
+    seconds = time.perf_counter() - start
+    observe("intent_route_seconds", seconds, intent=intent, method=method)
+    if metrics is not None:
+        metrics.update(intent=intent, score=score, method=method, seconds=seconds)
+    return answer
@@ -0,0 +1,347 @@
+"""Penjadwal panggilan LLM: single-flight, token bucket, backoff, dan load shedding.
+
+Semua panggilan generate_content_stream dari main.py lewat LLMScheduler:
+- Single-flight: panggilan identik (model, isi percakapan, config) yang berjalan
+  bersamaan digabung menjadi satu panggilan upstream; chunk yang sama diteruskan ke
+  semua peminta. Jika pemimpin berhenti di tengah jalan, pengikut yang belum menerima
+  chunk memulai panggilan baru; yang sudah menerima chunk mendapat LLMStreamInterrupted
+  (jawaban LLM tidak deterministik, jadi chunk dari panggilan lain tidak bisa disambung).
+- Token bucket (opsional): membatasi laju panggilan upstream (LLM_RATE_LIMIT per detik,
+  burst LLM_RATE_BURST). Default 0 = tanpa batas; atur sesuai kuota Gemini proyek.
+- Retry: error 429/5xx sebelum chunk pertama diulang dengan exponential backoff + jitter.
+- Load shedding: jika antrean token bucket terlalu panjang, LLMOverloaded dilempar segera
+  agar pemanggil bisa memberi jawaban lokal yang cepat.
+
+Versi sync (thread) dan async (asyncio) memakai token bucket dan statistik yang sama.
+
+Simulasi lonjakan dengan client stub yang menyisipkan 429 dan jeda:
+    python -m functions.llm_scheduler simulate --requests 40 --unique 5 --fail-rate 0.3 --rate 2
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from functions.tracing import increment, observe
+
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0")) # panggilan upstream per detik; 0 = tanpa batas
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "5"))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "5.0")) # detik antre maksimum sebelum load shedding
+LLM_MAX_RETRIES = 4
+LLM_BACKOFF_BASE = 0.5 # detik
+LLM_BACKOFF_MAX = 8.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMOverloaded(Exception):
+    """Antrean panggilan LLM terlalu panjang; pemanggil sebaiknya menjawab secara lokal."""
+
+
+class LLMStreamInterrupted(Exception):
+    """Panggilan bersama berhenti setelah sebagian jawaban terkirim; ulangi seluruh request."""
+
+    code = 503 # Dianggap error sementara oleh is_retryable()
+
+
+class TokenBucket:
+    """Token bucket thread-safe berbasis reservasi.
+
+    reserve() tidak pernah memblokir: ia memesan token berikutnya dan mengembalikan berapa
+    detik pemanggil harus menunggu, sehingga bisa dipakai dari thread maupun asyncio.
+    rate <= 0 berarti tanpa batas.
+    """
+
+    def __init__(self, rate: float = LLM_RATE_LIMIT, burst: int = LLM_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float = None) -> float:
+        """Memesan satu token; mengembalikan waktu tunggu, atau None jika melebihi max_wait."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE, cap: float = LLM_BACKOFF_MAX) -> float:
+    """Exponential backoff dengan full jitter untuk percobaan ke-attempt (mulai 0)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """True untuk error rate limit (429) dan error server sementara dari google-genai."""
+    return getattr(error, "code", None) in RETRYABLE_STATUS
+
+
+def request_key(model: str, contents: list, config) -> str:
+    """Kunci single-flight: model, isi percakapan, dan config yang diserialisasi."""
+    parts = [model, json.dumps([content.model_dump(mode="json", exclude_none=True) for content in contents],
+                               sort_keys=True, ensure_ascii=False)]
+    if config is not None:
+        parts.append(config.model_dump_json(exclude_none=True))
+    return "\x00".join(parts)
+
+
+class _Flight:
+    """Satu panggilan upstream yang sedang berjalan beserta chunk yang sudah diterima."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.abandoned = False # Pemimpin berhenti membaca sebelum selesai
+        self.updated = None # asyncio.Event untuk versi async, diganti setiap ada perubahan
+
+    def signal(self):
+        """Membangunkan semua pengikut async yang menunggu chunk berikutnya."""
+        event, self.updated = self.updated, asyncio.Event()
+        event.set()
+
+
+class LLMScheduler:
+    def __init__(self, rate: float = LLM_RATE_LIMIT, burst: int = LLM_RATE_BURST,
+                 max_queue_wait: float = LLM_MAX_QUEUE_WAIT, max_retries: int = LLM_MAX_RETRIES):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queue_wait = max_queue_wait
+        self.max_retries = max_retries
+        self._flights = {} # kunci -> _Flight (sync)
+        self._flights_lock = threading.Lock()
+        self._flight_changed = threading.Condition(self._flights_lock)
+        self._async_flights = {} # kunci -> _Flight (async, satu event loop)
+        self.stats = {"upstream_calls": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "shed": 0}
+
+    def _count(self, name: str):
+        self.stats[name] += 1
+        increment(f"llm_scheduler_{name}")
+
+    def _reserve(self) -> float:
+        wait = self.bucket.reserve(self.max_queue_wait)
+        if wait is None:
+            self._count("shed")
+            raise LLMOverloaded("Antrean panggilan LLM penuh")
+        observe("llm_queue_wait_seconds", wait)
+        return wait
+
+    # --- Sync -------------------------------------------------------------------------
+
+    def stream(self, llm, model: str, contents: list, config=None):
+        """Pengganti llm.models.generate_content_stream dengan penjadwalan."""
+        key = request_key(model, contents, config)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            yield from self._lead(key, flight, llm, model, contents, config)
+            return
+
+        self._count("coalesced")
+        position = 0
+        while True:
+            with self._flight_changed:
+                while position >= len(flight.chunks) and not (flight.done or flight.abandoned):
+                    self._flight_changed.wait()
+                new_chunks = flight.chunks[position:]
+                done, abandoned, error = flight.done, flight.abandoned, flight.error
+            for chunk in new_chunks:
+                yield chunk
+            position += len(new_chunks)
+            if error is not None:
+                raise error
+            if done:
+                return
+            if abandoned and not new_chunks:
+                yield from self._after_abandon(position, llm, model, contents, config)
+                return
+
+    def _after_abandon(self, position: int, llm, model: str, contents: list, config):
+        """Pemimpin berhenti di tengah jalan: mulai ulang jika pengikut belum menerima apa pun."""
+        if position:
+            raise LLMStreamInterrupted("Panggilan LLM bersama terhenti di tengah jawaban")
+        yield from self.stream(llm, model, contents, config)
+
+    def _lead(self, key: str, flight: _Flight, llm, model: str, contents: list, config):
+        try:
+            for chunk in self._call_with_retry(llm, model, contents, config):
+                with self._flight_changed:
+                    flight.chunks.append(chunk)
+                    self._flight_changed.notify_all()
+                yield chunk
+            with self._flight_changed:
+                flight.done = True
+        except Exception as e:
+            with self._flight_changed:
+                flight.error, flight.done = e, True
+            raise
+        finally:
+            with self._flight_changed:
+                if not flight.done:
+                    flight.abandoned = True
+                self._flights.pop(key, None)
+                self._flight_changed.notify_all()
+
+    def _call_with_retry(self, llm, model: str, contents: list, config):
+        attempt = 0
+        while True:
+            time.sleep(self._reserve())
+            self._count("upstream_calls")
+            started = False
+            try:
+                for chunk in llm.models.generate_content_stream(model=model, contents=contents, config=config):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Setelah chunk pertama terkirim, retry akan menggandakan teks; teruskan error
+                if started or not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if getattr(e, "code", None) == 429:
+                    self._count("rate_limited")
+                self._count("retries")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    # --- Async ------------------------------------------------------------------------
+
+    async def astream(self, llm, model: str, contents: list, config=None):
+        """Pengganti await llm.aio.models.generate_content_stream dengan penjadwalan."""
+        key = request_key(model, contents, config)
+        flight = self._async_flights.get(key)
+        if flight is None:
+            flight = self._async_flights[key] = _Flight()
+            flight.updated = asyncio.Event()
+            async for chunk in self._alead(key, flight, llm, model, contents, config):
+                yield chunk
+            return
+
+        self._count("coalesced")
+        position = 0
+        while True:
+            if position >= len(flight.chunks) and not (flight.done or flight.abandoned):
+                await flight.updated.wait()
+                continue
+            new_chunks = flight.chunks[position:]
+            for chunk in new_chunks:
+                yield chunk
+            position += len(new_chunks)
+            if flight.error is not None:
+                raise flight.error
+            if flight.done:
+                return
+            if flight.abandoned and not new_chunks:
+                if position:
+                    raise LLMStreamInterrupted("Panggilan LLM bersama terhenti di tengah jawaban")
+                async for chunk in self.astream(llm, model, contents, config):
+                    yield chunk
+                return
+
+    async def _alead(self, key: str, flight: _Flight, llm, model: str, contents: list, config):
+        try:
+            async for chunk in self._acall_with_retry(llm, model, contents, config):
+                flight.chunks.append(chunk)
+                flight.signal()
+                yield chunk
+            flight.done = True
+        except Exception as e:
+            flight.error, flight.done = e, True
+            raise
+        finally:
+            if not flight.done:
+                flight.abandoned = True
+            if self._async_flights.get(key) is flight:
+                del self._async_flights[key]
+            flight.signal()
+
+    async def _acall_with_retry(self, llm, model: str, contents: list, config):
+        attempt = 0
+        while True:
+            await asyncio.sleep(self._reserve())
+            self._count("upstream_calls")
+            started = False
+            try:
+                async for chunk in await llm.aio.models.generate_content_stream(
+                    model=model, contents=contents, config=config
+                ):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if getattr(e, "code", None) == 429:
+                    self._count("rate_limited")
+                self._count("retries")
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    """Mengembalikan LLMScheduler bersama untuk proses ini."""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = LLMScheduler()
+        return _shared_scheduler
+
+
+def simulate(n_requests: int, n_unique: int, fail_rate: float, rate: float, burst: int, max_queue_wait: float):
+    """Lonjakan request async ke StubClient yang menyisipkan 429; mencetak statistik scheduler."""
+    from google.genai import types
+    from functions.llm_stub import StubClient
+
+    llm = StubClient(first_chunk_delay=0.2, use_tools=False, fail_rate=fail_rate)
+    scheduler = LLMScheduler(rate=rate, burst=burst, max_queue_wait=max_queue_wait)
+    queries = [f"pertanyaan nomor {i % n_unique}" for i in range(n_requests)]
+    outcomes = {"ok": 0, "shed": 0, "error": 0}
+
+    async def one(query):
+        contents = [types.Content(role="user", parts=[types.Part.from_text(text=query)])]
+        try:
+            async for _ in scheduler.astream(llm, "stub", contents):
+                pass
+            outcomes["ok"] += 1
+        except LLMOverloaded:
+            outcomes["shed"] += 1
+        except Exception:
+            outcomes["error"] += 1
+
+    async def burst_run():
+        await asyncio.gather(*(one(query) for query in queries))
+
+    start = time.perf_counter()
+    asyncio.run(burst_run())
+    print(f"{n_requests} request ({n_unique} unik) dalam {time.perf_counter() - start:.2f}s: {outcomes}")
+    print(f"Scheduler: {scheduler.stats}, panggilan ke stub: {llm.models.calls}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulasi scheduler LLM dengan client stub.")
+    parser.add_argument("command", choices=["simulate"])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--unique", type=int, default=5, help="Jumlah pertanyaan berbeda")
+    parser.add_argument("--fail-rate", type=float, default=0.3, help="Peluang stub mengembalikan 429")
+    parser.add_argument("--rate", type=float, default=2.0, help="Panggilan upstream per detik (0 = tanpa batas)")
+    parser.add_argument("--burst", type=int, default=LLM_RATE_BURST)
+    parser.add_argument("--max-queue-wait", type=float, default=LLM_MAX_QUEUE_WAIT)
+    args = parser.parse_args(argv)
+    simulate(args.requests, args.unique, args.fail_rate, args.rate, args.burst, args.max_queue_wait)
+
+
+if __name__ == "__main__":
+    main()
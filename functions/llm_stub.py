@@ -0,0 +1,112 @@
+"""Client LLM lokal pengganti Gemini untuk pengujian dan load test offline.
+
+StubClient meniru bagian google.genai.Client yang dipakai main.py:
+client.models.generate_content_stream (sync) dan client.aio.models.generate_content_stream
+(async). Pada giliran pertama stub memanggil tool RAG, lalu menjawab dengan merangkum
+hasil tool dalam beberapa chunk teks, dengan jeda yang dapat diatur. Dengan fail_rate > 0,
+sebagian panggilan gagal dengan error 429 seperti rate limit Gemini.
+"""
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from google.genai import errors, types
+
+
+def _text_chunk(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part.from_text(text=text)]))]
+    )
+
+
+def _function_call_chunk(name: str, args: dict) -> types.GenerateContentResponse:
+    part = types.Part(function_call=types.FunctionCall(name=name, args=args))
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[part]))]
+    )
+
+
+def _rate_limit_error() -> errors.ClientError:
+    return errors.ClientError(429, {"error": {"code": 429, "message": "Resource has been exhausted (stub).",
+                                              "status": "RESOURCE_EXHAUSTED"}})
+
+
+class StubModels:
+    """Implementasi generate_content_stream yang deterministik."""
+
+    def __init__(self, first_chunk_delay: float = 0.2, chunk_delay: float = 0.02, n_chunks: int = 8,
+                 use_tools: bool = True, fail_rate: float = 0.0, fail_delay: float = 0.05, seed: int = 0):
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_delay = chunk_delay
+        self.n_chunks = n_chunks
+        self.use_tools = use_tools
+        self.fail_rate = fail_rate
+        self.fail_delay = fail_delay
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def should_fail(self) -> bool:
+        """Menentukan apakah panggilan ini disimulasikan terkena rate limit."""
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            self.failures += 1
+            return True
+        return False
+
+    def plan(self, contents: list) -> list:
+        """Menentukan (jeda, chunk) yang akan dikirim untuk isi percakapan ini."""
+        self.calls += 1
+        query = contents[0].parts[0].text or ""
+        function_responses = [
+            part.function_response for content in contents[1:] for part in (content.parts or [])
+            if part.function_response is not None
+        ]
+        if self.use_tools and not function_responses:
+            return [(self.first_chunk_delay, _function_call_chunk("RAG", {"query": query}))]
+
+        sources = []
+        for response in function_responses:
+            for doc in (response.response or {}).get("documents", []):
+                sources.append(doc.get("source", "N/A"))
+        summary = f"Jawaban stub untuk '{query}'"
+        if sources:
+            summary += f" berdasarkan {', '.join(sorted(set(sources)))}"
+        words = (summary + ".").split()
+        size = max(1, len(words) // self.n_chunks)
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        return [(self.first_chunk_delay if i == 0 else self.chunk_delay, _text_chunk(piece))
+                for i, piece in enumerate(pieces)]
+
+    def generate_content_stream(self, model: str, contents: list, config=None):
+        if self.should_fail():
+            time.sleep(self.fail_delay)
+            raise _rate_limit_error()
+        for delay, chunk in self.plan(contents):
+            time.sleep(delay)
+            yield chunk
+
+
+class AsyncStubModels:
+    def __init__(self, models: StubModels):
+        self._models = models
+
+    async def generate_content_stream(self, model: str, contents: list, config=None):
+        if self._models.should_fail():
+            await asyncio.sleep(self._models.fail_delay)
+            raise _rate_limit_error()
+        plan = self._models.plan(contents)
+
+        async def stream():
+            for delay, chunk in plan:
+                await asyncio.sleep(delay)
+                yield chunk
+
+        return stream()
+
+
+class StubClient:
+    """Pengganti genai.Client: .models (sync) dan .aio.models (async)."""
+
+    def __init__(self, **options):
+        self.models = StubModels(**options)
+        self.aio = SimpleNamespace(models=AsyncStubModels(self.models))
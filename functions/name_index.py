@@ -0,0 +1,127 @@
+import re
+
+# Skor minimum agar sebuah nama dianggap cocok, dan jarak maksimum dari skor terbaik
+# untuk ikut dikembalikan (mis. dua dosen bernama mirip)
+FUZZY_MIN_SCORE = 0.6
+FUZZY_MARGIN = 0.1
+EDIT_MAX_LENGTH_DIFF = 2
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str, stopwords: set) -> list:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in stopwords]
+
+
+def trigrams(text: str) -> set:
+    """Trigram karakter dengan padding, sehingga awal dan akhir kata ikut berbobot."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def edit_similarity(a: str, b: str) -> float:
+    """1 - jarak Levenshtein / panjang kata terpanjang."""
+    if a == b:
+        return 1.0
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return 1 - previous[-1] / max(len(a), len(b))
+
+
+class NameIndex:
+    """Index trigram untuk mencocokkan nama (dosen, mata kuliah) dari transkrip yang tidak rapi.
+
+    Skor sebuah nama adalah nilai terbesar dari:
+    - kemiripan Dice trigram seluruh nama dengan seluruh query, dan
+    - rata-rata, untuk tiap kata di query, kemiripan terbaiknya dengan salah satu kata nama
+      (Dice trigram atau edit distance, mana yang lebih tinggi).
+    Kata di stopwords (gelar, "dan") diabaikan di kedua sisi. Kandidat kata diambil dari
+    posting trigram, sehingga kata yang sama sekali tidak mirip tidak pernah dibandingkan.
+    """
+
+    def __init__(self, names: list, stopwords: set = frozenset()):
+        self.names = sorted(set(name for name in names if name))
+        self.stopwords = set(stopwords)
+        self.name_grams = []
+        self.name_words = [] # indeks nama -> daftar indeks kata
+        self.words = [] # kata unik di semua nama
+        self.word_grams = []
+        self.postings = {} # trigram -> indeks kata
+        self.word_names = [] # indeks kata -> indeks nama yang memuatnya
+        word_ids = {}
+        for name_id, name in enumerate(self.names):
+            tokens = _tokens(name, self.stopwords)
+            self.name_grams.append(trigrams(" ".join(tokens)))
+            ids = []
+            for token in tokens:
+                if token not in word_ids:
+                    word_ids[token] = len(self.words)
+                    self.words.append(token)
+                    self.word_grams.append(trigrams(token))
+                    self.word_names.append([])
+                    for gram in self.word_grams[-1]:
+                        self.postings.setdefault(gram, []).append(word_ids[token])
+                ids.append(word_ids[token])
+                if name_id not in self.word_names[word_ids[token]]:
+                    self.word_names[word_ids[token]].append(name_id)
+            self.name_words.append(ids)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _word_scores(self, token: str) -> dict:
+        """Kemiripan satu kata query dengan setiap kata index yang berbagi minimal satu trigram.
+
+        Dice dihitung dari jumlah trigram bersama di posting. Edit distance (lebih mahal)
+        hanya dipakai untuk menyelamatkan kata yang Dice-nya di bawah FUZZY_MIN_SCORE
+        (biasanya kata pendek dengan satu huruf salah), berbagi minimal dua trigram, dan
+        panjangnya berbeda paling banyak EDIT_MAX_LENGTH_DIFF huruf.
+        """
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for word_id in self.postings.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+        scores = {}
+        for word_id, count in shared.items():
+            score = 2 * count / (len(grams) + len(self.word_grams[word_id]))
+            word = self.words[word_id]
+            if score < FUZZY_MIN_SCORE and count >= 2 and abs(len(word) - len(token)) <= EDIT_MAX_LENGTH_DIFF:
+                score = max(score, edit_similarity(token, word))
+            scores[word_id] = score
+        return scores
+
+    def search(self, query: str, limit: int = 3, min_score: float = FUZZY_MIN_SCORE) -> list:
+        """Nama terbaik untuk query sebagai [(nama, skor)], skor 0..1 menurun."""
+        tokens = _tokens(query, self.stopwords)
+        if not tokens or not self.names:
+            return []
+        query_grams = trigrams(" ".join(tokens))
+        per_token = [self._word_scores(token) for token in tokens]
+        # Hanya nama yang memuat minimal satu kata kandidat yang perlu dinilai
+        candidates = {name_id for scores in per_token for word_id in scores for name_id in self.word_names[word_id]}
+        results = []
+        for name_id in candidates:
+            word_ids = self.name_words[name_id]
+            token_score = sum(max(scores.get(w, 0.0) for w in word_ids) for scores in per_token) / len(tokens)
+            score = max(token_score, _dice(query_grams, self.name_grams[name_id]))
+            if score >= min_score:
+                results.append((self.names[name_id], round(score, 3)))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
+
+    def best_matches(self, query: str, margin: float = FUZZY_MARGIN, min_score: float = FUZZY_MIN_SCORE) -> list:
+        """Nama dengan skor dalam `margin` dari skor terbaik (kosong jika tidak ada yang cukup mirip)."""
+        results = self.search(query, limit=len(self.names), min_score=min_score)
+        if not results:
+            return []
+        top = results[0][1]
+        return [(name, score) for name, score in results if score >= top - margin]
@@ -0,0 +1,222 @@
+"""Backend embedding ONNX (int8) untuk CPU.
+
+Model sentence-transformers diekspor ke graf ONNX, lalu dikuantisasi dinamis ke int8.
+Mean pooling dan normalisasi L2 dilakukan di NumPy, sama seperti pipeline
+sentence-transformers untuk all-MiniLM-L6-v2.
+
+Penggunaan:
+    python -m functions.onnx_embeddings export   # ekspor + kuantisasi model
+    python -m functions.onnx_embeddings parity   # bandingkan dengan model float (PyTorch)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from langchain_core.embeddings import Embeddings
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+ONNX_DIR = os.path.join(current_dir, "..", "cache", "onnx")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256 # Sama dengan max_seq_length all-MiniLM-L6-v2
+BATCH_SIZE = 32
+ONNX_THREADS = 0 # 0 = biarkan onnxruntime memilih jumlah thread
+
+# Kalimat contoh untuk parity check (query khas mahasiswa)
+SAMPLE_QUERIES = [
+    "apa sejarah ukri?",
+    "siapa dekan fakultas teknologi industri?",
+    "apa makna lambang ukri?",
+    "di mana alamat kampus ukri?",
+    "program studi apa saja di fakultas teknologi industri?",
+    "apa visi dan misi fakultas?",
+    "kapan universitas kebangsaan didirikan?",
+    "siapa pendiri yayasan pendidikan kebangsaan?",
+    "apa arti warna hijau pada lambang?",
+    "bagaimana struktur organisasi universitas?",
+]
+
+
+def model_dir(model_name: str = EMBEDDING_MODEL) -> str:
+    """Direktori artefak ONNX untuk sebuah model."""
+    return os.path.join(ONNX_DIR, model_name.replace("/", "__"))
+
+
+def _hub_name(model_name: str) -> str:
+    """Nama lengkap model di HuggingFace Hub (tanpa prefix dianggap sentence-transformers/)."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def export_onnx(model_name: str = EMBEDDING_MODEL, output_dir: str = None) -> str:
+    """Mengekspor model ke ONNX lalu membuat versi int8 dengan kuantisasi dinamis."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_dir = output_dir or model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    float_path = os.path.join(output_dir, "model.onnx")
+    int8_path = os.path.join(output_dir, "model-int8.onnx")
+
+    print(f"Mengekspor {model_name} ke ONNX: {output_dir}")
+    tokenizer = AutoTokenizer.from_pretrained(_hub_name(model_name))
+    model = AutoModel.from_pretrained(_hub_name(model_name))
+    model.eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["contoh kalimat"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            float_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    print("Menjalankan kuantisasi dinamis int8...")
+    quantize_dynamic(float_path, int8_path, weight_type=QuantType.QInt8)
+    with open(os.path.join(output_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "max_seq_length": MAX_SEQ_LENGTH}, f)
+    print(f"Selesai: {os.path.getsize(float_path) / 1e6:.1f} MB (float) -> "
+          f"{os.path.getsize(int8_path) / 1e6:.1f} MB (int8)")
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """Embeddings LangChain yang menjalankan model ONNX dengan onnxruntime di CPU."""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, quantized: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        directory = model_dir(model_name)
+        onnx_path = os.path.join(directory, "model-int8.onnx" if quantized else "model.onnx")
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"Model ONNX tidak ditemukan di '{onnx_path}'. "
+                f"Jalankan 'python -m functions.onnx_embeddings export' terlebih dahulu."
+            )
+
+        self.model_name = model_name
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {node.name for node in self.session.get_inputs()}
+
+    def _embed(self, texts: list) -> list:
+        import numpy as np
+
+        vectors = []
+        for i in range(0, len(texts), BATCH_SIZE):
+            encodings = self.tokenizer.encode_batch(texts[i:i + BATCH_SIZE])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling dengan attention mask, lalu normalisasi L2
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: list) -> list:
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> list:
+        return self._embed([text])[0]
+
+
+def _load_corpus_texts() -> list:
+    """Mengambil teks chunk dari index BM25 snapshot aktif (bm25.json) sebagai korpus parity check."""
+    from functions import index_store
+
+    bm25_path = os.path.join(index_store.current_snapshot_dir(), index_store.BM25_FILE)
+    if not os.path.exists(bm25_path):
+        return []
+    with open(bm25_path, "r", encoding="utf-8") as f:
+        return [doc["text"] for doc in json.load(f)["docs"]]
+
+
+def parity_check(model_name: str = EMBEDDING_MODEL, k: int = 5) -> dict:
+    """Membandingkan backend ONNX int8 dengan model float (PyTorch).
+
+    Melaporkan drift cosine per teks dan recall@k hasil pencarian int8 terhadap float
+    pada SAMPLE_QUERIES atas korpus chunk yang sudah di-index.
+    """
+    import numpy as np
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    corpus = _load_corpus_texts()
+    if not corpus:
+        print("Korpus tidak ditemukan (bm25.json di snapshot aktif); hanya query contoh yang dibandingkan.")
+    texts = SAMPLE_QUERIES + corpus
+
+    float_model = HuggingFaceEmbeddings(model_name=model_name)
+    onnx_model = OnnxEmbeddings(model_name)
+
+    start = time.perf_counter()
+    float_vecs = np.array(float_model.embed_documents(texts), dtype=np.float32)
+    float_time = time.perf_counter() - start
+    start = time.perf_counter()
+    onnx_vecs = np.array(onnx_model.embed_documents(texts), dtype=np.float32)
+    onnx_time = time.perf_counter() - start
+
+    def normalize(m):
+        return m / np.clip(np.linalg.norm(m, axis=1, keepdims=True), 1e-12, None)
+
+    float_vecs, onnx_vecs = normalize(float_vecs), normalize(onnx_vecs)
+    cosine = (float_vecs * onnx_vecs).sum(axis=1)
+    report = {
+        "model": model_name,
+        "n_texts": len(texts),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        "float_seconds": float_time,
+        "onnx_int8_seconds": onnx_time,
+        "speedup": float_time / onnx_time if onnx_time > 0 else None,
+    }
+
+    if corpus:
+        n_queries = len(SAMPLE_QUERIES)
+        top_k = min(k, len(corpus))
+        float_top = np.argsort(-(float_vecs[:n_queries] @ float_vecs[n_queries:].T), axis=1)[:, :top_k]
+        onnx_top = np.argsort(-(onnx_vecs[:n_queries] @ onnx_vecs[n_queries:].T), axis=1)[:, :top_k]
+        overlaps = [len(set(f) & set(o)) / top_k for f, o in zip(float_top, onnx_top)]
+        report[f"recall_at_{top_k}_vs_float"] = float(np.mean(overlaps))
+
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ekspor dan verifikasi backend embedding ONNX int8.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("-k", type=int, default=5, help="k untuk recall pada parity check")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_onnx(args.model)
+    else:
+        parity_check(args.model, k=args.k)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,42 +1,383 @@
 import os
-from langchain_community.vectorstores import Chroma
-# Ganti SentenceTransformerEmbeddings dengan HuggingFaceEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
+import time
+import threading
+from collections import OrderedDict
+from functions.bm25 import BM25Index, reciprocal_rank_fusion
+from functions.tracing import span, traced
+from functions.retrieval_service import RetrievalServiceError
+from functions import index_store
 
 # Tentukan path absolut ke direktori skrip saat ini
 current_dir = os.path.dirname(os.path.abspath(__file__))
-# Tentukan path absolut ke direktori db
+# Tentukan path absolut ke direktori db; index aktif ada di snapshot yang ditunjuk db/CURRENT
+# (lihat functions/index_store.py) dan dimuat ulang otomatis saat train.py menerbitkan versi baru
 DB_PATH = os.path.join(current_dir, "..", "db")
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Backend pencarian dense: "chroma" (default) atau "flat" (matriks NumPy hasil train.py --export-flat)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# Cache hasil retrieval per (query ternormalisasi, k)
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 600 # detik
+# Retrieval hybrid: index leksikal BM25 (bm25.json di snapshot) digabung dengan hasil dense via RRF
+HYBRID_CANDIDATES = 10 # Jumlah kandidat dari masing-masing retriever sebelum fusion
+RRF_K = 60
+# Jika skor BM25 teratas cukup tinggi dan jauh di atas skor kedua, lewati pencarian dense
+LEXICAL_SHORTCUT_MIN_SCORE = 6.0
+LEXICAL_SHORTCUT_RATIO = 2.0
+# Jika diatur, retrieval dan embedding diteruskan ke sidecar di Unix socket ini
+# (python -m functions.retrieval_service) sehingga proses ini tidak memuat model sendiri
+RETRIEVAL_SOCKET = os.getenv("RETRIEVAL_SOCKET", "")
 
-# Inisialisasi embedding function menggunakan HuggingFaceEmbeddings
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+# Model embedding dan vector store dimuat secara lazy pada retrieval pertama (atau lewat
+# warmup()/preload_async()), sehingga import modul ini tidak memperlambat startup.
+embeddings = None
+vectorstore = None
+_loaded = False
+_loaded_version = None
+_failed_version = None
+_load_lock = threading.Lock()
+_preload_lock = threading.Lock()
+_preload_thread = None
+_remote = {"client": None, "ready": False, "warned": False}
 
-# Muat vector store yang sudah ada
-if os.path.exists(DB_PATH):
-    vectorstore = Chroma(persist_directory=DB_PATH, embedding_function=embeddings)
-    print(f"Vector store dimuat dari: {DB_PATH}")
-else:
-    print(f"Error: Direktori vector store tidak ditemukan di '{DB_PATH}'. Pastikan path sudah benar dan Anda telah menjalankan train.py terlebih dahulu.")
-    vectorstore = None # Atau tangani error sesuai kebutuhan
+def get_vectorstore():
+    """Mengembalikan vector store snapshot aktif; dimuat sekali per versi index.
 
-def retrieve_context(query: str, k: int = 5) -> list:
-    """Mengambil k dokumen paling relevan dari vector store berdasarkan query."""
-    if vectorstore is None:
-        print("Vector store belum diinisialisasi.")
-        return []
+    Jika train.py menerbitkan snapshot baru, store baru dimuat lalu menggantikan yang lama
+    dalam satu assignment; query yang sedang berjalan tetap memakai referensi lamanya.
+    Jika snapshot baru gagal dimuat, store lama tetap dipakai.
+    """
+    global embeddings, vectorstore, _loaded, _loaded_version, _failed_version
+    version = index_version()
+    if _loaded and version in (_loaded_version, _failed_version):
+        return vectorstore
+    with _load_lock:
+        version = index_version()
+        if _loaded and version in (_loaded_version, _failed_version):
+            return vectorstore
+        # Import berat (torch, sentence-transformers, chromadb) ditunda sampai benar-benar dibutuhkan
+        from functions.embeddings import get_embeddings
+
+        # Inisialisasi embedding function (HuggingFaceEmbeddings dengan cache embedding di disk)
+        if embeddings is None:
+            embeddings = get_embeddings(EMBEDDING_MODEL)
+
+        store = _load_store(index_store.snapshot_dir(version, DB_PATH))
+        if store is not None or vectorstore is None:
+            vectorstore, _loaded_version, _failed_version = store, version, None
+            if _loaded and store is not None:
+                print(f"Index diganti ke versi {version or '(lama)'}")
+        else:
+            # Tetap layani dari snapshot sebelumnya; versi ini tidak dicoba lagi
+            print(f"Snapshot {version} tidak dapat dimuat, tetap memakai versi {_loaded_version}")
+            _failed_version = version
+        _loaded = True
+    return vectorstore
+
+def _load_store(path: str):
+    """Membuka vector store di direktori snapshot sesuai VECTOR_BACKEND; None jika gagal."""
+    if VECTOR_BACKEND == "flat":
+        from functions.flat_index import FlatIndex
+
+        flat_path = os.path.join(path, index_store.FLAT_DIR)
+        try:
+            store = FlatIndex(flat_path)
+            print(f"Index flat dimuat dari: {flat_path} ({len(store)} chunk)")
+            return store
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: Index flat tidak dapat dimuat dari '{flat_path}' ({e}). Jalankan train.py --export-flat terlebih dahulu.")
+            return None
+    if not os.path.exists(path):
+        print(f"Error: Direktori vector store tidak ditemukan di '{path}'. Pastikan path sudah benar dan Anda telah menjalankan train.py terlebih dahulu.")
+        return None
+    from langchain_community.vectorstores import Chroma
+
+    try:
+        store = Chroma(persist_directory=path, embedding_function=embeddings)
+    except Exception as e:
+        print(f"Error saat membuka vector store di '{path}': {e}")
+        return None
+    print(f"Vector store dimuat dari: {path}")
+    return store
+
+def _remote_client():
+    """Client sidecar retrieval, atau None jika RETRIEVAL_SOCKET tidak diatur."""
+    if not RETRIEVAL_SOCKET:
+        return None
+    if _remote["client"] is None:
+        from functions.retrieval_service import RetrievalClient
+
+        _remote["client"] = RetrievalClient(RETRIEVAL_SOCKET)
+    return _remote["client"]
 
+def _remote_failed(error: Exception):
+    """Sidecar tidak bisa dihubungi: pakai model lokal untuk panggilan ini."""
+    _remote["ready"] = False
+    if not _remote["warned"]:
+        print(f"Layanan retrieval di {RETRIEVAL_SOCKET} tidak tersedia ({error}); memakai model lokal.")
+        _remote["warned"] = True
+
+def warmup():
+    """Memuat model dan vector store, lalu menjalankan satu forward pass agar query pertama cepat."""
+    start = time.perf_counter()
+    client = _remote_client()
+    if client is not None:
+        try:
+            client.ping()
+            _remote["ready"] = True
+            print(f"RAG memakai layanan retrieval di {RETRIEVAL_SOCKET} ({time.perf_counter() - start:.3f}s)")
+            return
+        except OSError as e:
+            _remote_failed(e)
+    get_vectorstore()
+    if embeddings is not None:
+        # Lewati cache embedding agar forward pass model benar-benar dijalankan sekali
+        getattr(embeddings, "embeddings", embeddings).embed_query("warmup")
+    print(f"RAG siap dalam {time.perf_counter() - start:.2f}s")
+
+def is_ready() -> bool:
+    """True jika model embedding dan vector store sudah dimuat (tidak memicu pemuatan)."""
+    return _remote["ready"] or (_loaded and embeddings is not None)
+
+def embed_query(text: str) -> list:
+    """Embedding satu teks dengan model yang sama dengan retrieval (memakai cache embedding)."""
+    if _remote_client() is not None:
+        return embed_documents([text])[0]
+    return _local_embeddings().embed_query(text)
+
+def embed_documents(texts: list) -> list:
+    """Embedding beberapa teks (chunk yang sudah di-index biasanya sudah ada di cache embedding)."""
+    client = _remote_client()
+    if client is not None:
+        try:
+            vectors = client.embed(texts)
+            _remote["ready"] = True
+            return vectors
+        except OSError as e:
+            _remote_failed(e)
+    return _local_embeddings().embed_documents(texts)
+
+def _local_embeddings():
+    get_vectorstore()
+    return embeddings
+
+def preload_async() -> threading.Thread:
+    """Menjalankan warmup() di thread latar belakang (hanya sekali per proses)."""
+    global _preload_thread
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_safe_warmup, name="rag-preload", daemon=True)
+            _preload_thread.start()
+    return _preload_thread
+
+def _safe_warmup():
     try:
-        # Lakukan pencarian similarity
-        results = vectorstore.similarity_search(query, k=k)
-        print(f"Ditemukan {len(results)} dokumen relevan untuk query: '{query}'")
-        # Mengembalikan konten dokumen saja untuk konteks
-        # return [doc.page_content for doc in results]
-        # Mengembalikan seluruh objek Document untuk akses metadata jika perlu
-        return results
+        warmup()
     except Exception as e:
-        print(f"Error saat melakukan retrieval: {e}")
-        return []
+        print(f"Error saat preload RAG: {e}")
+
+_query_cache = OrderedDict() # (query, k) -> (waktu disimpan, hasil)
+_query_cache_lock = threading.Lock()
+_query_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0, "lexical_shortcuts": 0}
+_lexical = {"version": None, "index": None}
+_lexical_lock = threading.Lock()
+
+def normalize_query(query: str) -> str:
+    """Normalisasi query untuk kunci cache: huruf kecil dan spasi dirapikan."""
+    return " ".join(query.lower().split())
+
+def index_version() -> str:
+    """Versi index aktif yang diterbitkan train.py (string kosong jika belum ada).
+
+    File CURRENT hanya dibaca ulang jika mtime/ukurannya berubah, sehingga murah dipanggil per query.
+    """
+    return index_store.current_version(DB_PATH)
+
+def _check_index_version():
+    """Mengosongkan cache query jika versi index di disk sudah berubah."""
+    version = index_version()
+    with _query_cache_lock:
+        if _query_cache_stats.get("version") != version:
+            if _query_cache:
+                _query_cache_stats["invalidations"] += 1
+            _query_cache.clear()
+            _query_cache_stats["version"] = version
+
+def cache_stats() -> dict:
+    """Statistik cache query: hits, misses, invalidations, ukuran, dan versi index."""
+    with _query_cache_lock:
+        stats = dict(_query_cache_stats)
+        stats["size"] = len(_query_cache)
+    return stats
+
+def clear_query_cache():
+    """Mengosongkan cache query secara manual."""
+    with _query_cache_lock:
+        _query_cache.clear()
+
+def get_lexical_index():
+    """Memuat index BM25 dari disk; dimuat ulang otomatis jika versi index berubah."""
+    version = index_version()
+    with _lexical_lock:
+        if _lexical["version"] != version:
+            _lexical["index"] = None
+            bm25_path = os.path.join(index_store.snapshot_dir(version, DB_PATH), index_store.BM25_FILE)
+            if os.path.exists(bm25_path):
+                try:
+                    _lexical["index"] = BM25Index.load(bm25_path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Error saat memuat index BM25: {e}")
+            _lexical["version"] = version
+        return _lexical["index"]
+
+def _lexical_document(lexical_index, doc_index: int):
+    """Mengubah entri index BM25 menjadi Document LangChain."""
+    from langchain_core.documents import Document
+
+    entry = lexical_index.docs[doc_index]
+    return Document(page_content=entry["text"], metadata=dict(entry["metadata"]), id=entry["id"])
+
+def _is_lexical_decisive(lexical_hits: list) -> bool:
+    """True jika hasil BM25 teratas cukup meyakinkan untuk melewati pencarian dense."""
+    if not lexical_hits or lexical_hits[0][1] < LEXICAL_SHORTCUT_MIN_SCORE:
+        return False
+    if len(lexical_hits) == 1:
+        return True
+    return lexical_hits[0][1] >= LEXICAL_SHORTCUT_RATIO * lexical_hits[1][1]
+
+def _dense_search_batch(vectorstore, query_vectors: list, k: int) -> list:
+    """Pencarian dense untuk banyak vektor query dalam satu panggilan ke vector store."""
+    from langchain_core.documents import Document
+
+    if VECTOR_BACKEND == "flat":
+        # Satu perkalian matriks untuk seluruh batch query
+        return vectorstore.search_documents(query_vectors, k)
+
+    response = vectorstore._collection.query(
+        query_embeddings=query_vectors, n_results=k, include=["documents", "metadatas"]
+    )
+    results = []
+    for ids, texts, metadatas in zip(response["ids"], response["documents"], response["metadatas"]):
+        results.append([
+            Document(page_content=text, metadata=metadata or {}, id=doc_id)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        ])
+    return results
+
+def _fuse(dense_docs: list, lexical_index, lexical_hits: list, k: int) -> list:
+    """Menggabungkan hasil dense dan leksikal dengan reciprocal rank fusion."""
+    if not lexical_hits:
+        return dense_docs[:k]
+
+    # Chunk yang sama dikenali dari isinya, karena dense dan leksikal berasal dari chunk yang sama
+    by_content = {}
+    dense_ranking = []
+    for doc in dense_docs:
+        by_content.setdefault(doc.page_content, doc)
+        dense_ranking.append(doc.page_content)
+    lexical_ranking = []
+    for doc_index, _ in lexical_hits:
+        doc = _lexical_document(lexical_index, doc_index)
+        by_content.setdefault(doc.page_content, doc)
+        lexical_ranking.append(doc.page_content)
+
+    fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], k=RRF_K)
+    return [by_content[content] for content in fused[:k]]
+
+def _hybrid_search_batch(vectorstore, queries: list, k: int) -> list:
+    """Pencarian leksikal (BM25) + dense untuk banyak query sekaligus.
+
+    Query yang hasil BM25-nya meyakinkan tidak di-embed sama sekali; sisanya di-embed
+    dalam satu batch dan dicari dengan satu query ke vector store.
+    """
+    n_candidates = max(k, HYBRID_CANDIDATES)
+    lexical_index = get_lexical_index()
+    with span("lexical_search", queries=len(queries)):
+        lexical_hits = [lexical_index.search(query, k=n_candidates) if lexical_index else [] for query in queries]
+
+    results = [None] * len(queries)
+    dense_needed = []
+    for i, hits in enumerate(lexical_hits):
+        if _is_lexical_decisive(hits):
+            results[i] = [_lexical_document(lexical_index, doc_index) for doc_index, _ in hits[:k]]
+            with _query_cache_lock:
+                _query_cache_stats["lexical_shortcuts"] += 1
+        else:
+            dense_needed.append(i)
+
+    if dense_needed:
+        with span("embed_query", queries=len(dense_needed)):
+            query_vectors = embeddings.embed_documents([queries[i] for i in dense_needed])
+        with span("dense_search", queries=len(dense_needed), backend=VECTOR_BACKEND):
+            dense_results = _dense_search_batch(vectorstore, query_vectors, n_candidates if lexical_index else k)
+        for i, dense_docs in zip(dense_needed, dense_results):
+            results[i] = _fuse(dense_docs, lexical_index, lexical_hits[i], k)
+    return results
+
+@traced("retrieve_context")
+def retrieve_context_batch(queries: list, k: int = 5) -> list:
+    """Mengambil k dokumen paling relevan untuk banyak query sekaligus.
+
+    Mengembalikan list hasil (list Document) dengan urutan yang sama seperti queries.
+    """
+    client = _remote_client()
+    if client is not None:
+        try:
+            results = client.retrieve_batch(queries, k=k)
+            _remote["ready"] = True
+            return results
+        except RetrievalServiceError as e:
+            print(f"Error saat melakukan retrieval: {e}")
+            return [[] for _ in queries]
+        except OSError as e:
+            _remote_failed(e)
+
+    vectorstore = get_vectorstore()
+    if vectorstore is None:
+        print("Vector store belum diinisialisasi.")
+        return [[] for _ in queries]
+
+    _check_index_version()
+    results = [None] * len(queries)
+    pending = OrderedDict() # cache_key -> indeks query yang menunggu hasil
+    now = time.monotonic()
+    with _query_cache_lock:
+        for i, query in enumerate(queries):
+            cache_key = (normalize_query(query), k)
+            entry = _query_cache.get(cache_key)
+            if entry is not None and now - entry[0] <= QUERY_CACHE_TTL:
+                _query_cache.move_to_end(cache_key)
+                _query_cache_stats["hits"] += 1
+                results[i] = list(entry[1])
+            else:
+                _query_cache_stats["misses"] += 1
+                pending.setdefault(cache_key, []).append(i)
+
+    if pending:
+        try:
+            # Lakukan pencarian hybrid (BM25 + similarity), sekali per query unik
+            keys = list(pending)
+            fresh = _hybrid_search_batch(vectorstore, [queries[pending[key][0]] for key in keys], k)
+            with _query_cache_lock:
+                for cache_key, docs in zip(keys, fresh):
+                    _query_cache[cache_key] = (now, docs)
+                    _query_cache.move_to_end(cache_key)
+                while len(_query_cache) > QUERY_CACHE_SIZE:
+                    _query_cache.popitem(last=False)
+            for cache_key, docs in zip(keys, fresh):
+                for i in pending[cache_key]:
+                    results[i] = list(docs)
+        except Exception as e:
+            print(f"Error saat melakukan retrieval: {e}")
+            results = [docs if docs is not None else [] for docs in results]
+    return results
+
+def retrieve_context(query: str, k: int = 5) -> list:
+    """Mengambil k dokumen paling relevan dari vector store berdasarkan query."""
+    results = retrieve_context_batch([query], k=k)[0]
+    print(f"Ditemukan {len(results)} dokumen relevan untuk query: '{query}'")
+    # Mengembalikan seluruh objek Document untuk akses metadata jika perlu
+    return results
 
 # Contoh penggunaan (bisa dihapus atau dikomentari)
 if __name__ == '__main__':
@@ -0,0 +1,328 @@
+"""Sidecar retrieval: satu model embedding dan index untuk semua proses di satu host.
+
+Layanan mendengarkan di Unix socket dan menerima request JSON per baris:
+    {"op": "retrieve", "queries": [...], "k": 3}  -> {"documents": [[{id, page_content, metadata}, ...], ...]}
+    {"op": "embed", "texts": [...]}               -> {"vectors": [[...], ...]}
+    {"op": "ping"}                                -> {"ok": true, "index_version": ..., "stats": {...}}
+
+Request dari banyak koneksi dikumpulkan selama BATCH_WINDOW (atau sampai BATCH_MAX
+request) lalu dijalankan sebagai satu batch: satu embed_documents dan satu query ke
+vector store per nilai k.
+
+Proses lain cukup mengatur RETRIEVAL_SOCKET; functions/rag.py lalu meneruskan
+retrieve_context, embed_query, dan embed_documents ke layanan ini lewat RetrievalClient,
+sehingga model embedding tidak pernah dimuat di proses tersebut.
+
+    python -m functions.retrieval_service --socket /tmp/nara-retrieval.sock
+    RETRIEVAL_SOCKET=/tmp/nara-retrieval.sock python main.py
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SOCKET_PATH = "/tmp/nara-retrieval.sock"
+BATCH_WINDOW = 0.003 # detik menunggu request lain sebelum batch dijalankan
+BATCH_MAX = 64
+CLIENT_TIMEOUT = 30 # detik
+MAX_REQUEST_BYTES = 4 * 1024 * 1024 # Batas satu baris request (op embed bisa memuat banyak teks)
+MAX_K = 50
+
+
+class RetrievalServiceError(Exception):
+    """Layanan retrieval mengembalikan error untuk request ini."""
+
+
+def validate_request(request) -> str:
+    """Pesan error untuk request yang tidak valid, atau None jika valid.
+
+    Diperiksa sebelum request masuk batch, sehingga request yang salah bentuk dari satu
+    client tidak pernah ikut diproses bersama request client lain.
+    """
+    if not isinstance(request, dict):
+        return "Request harus objek JSON"
+    op = request.get("op")
+    if op == "ping":
+        return None
+    if op == "retrieve":
+        k = request.get("k", 5)
+        if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= MAX_K:
+            return f"'k' harus bilangan bulat 1..{MAX_K}"
+        field = "queries"
+    elif op == "embed":
+        field = "texts"
+    else:
+        return f"Operasi '{op}' tidak dikenal"
+    values = request.get(field)
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        return f"'{field}' harus daftar string"
+    return None
+
+
+class RetrievalClient:
+    """Client tipis untuk sidecar; satu koneksi per thread, tersambung ulang otomatis.
+
+    Hanya memakai modul standar (plus langchain_core untuk Document), sehingga proses
+    pemanggil tidak memuat torch, sentence-transformers, atau chromadb.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def request(self, payload: dict) -> dict:
+        """Mengirim satu request; mencoba sekali lagi dengan koneksi baru jika koneksi lama putus."""
+        data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+        for attempt in range(2):
+            try:
+                sock, reader = self._connection()
+                sock.sendall(data)
+                line = reader.readline()
+                if not line:
+                    raise ConnectionError("Koneksi ke layanan retrieval terputus")
+                break
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+        response = json.loads(line)
+        if "error" in response:
+            raise RetrievalServiceError(response["error"])
+        return response
+
+    def retrieve_batch(self, queries: list, k: int = 5) -> list:
+        from langchain_core.documents import Document
+
+        response = self.request({"op": "retrieve", "queries": queries, "k": k})
+        return [
+            [Document(page_content=doc["page_content"], metadata=doc["metadata"], id=doc["id"]) for doc in docs]
+            for docs in response["documents"]
+        ]
+
+    def embed(self, texts: list) -> list:
+        return self.request({"op": "embed", "texts": texts})["vectors"]
+
+    def ping(self) -> dict:
+        return self.request({"op": "ping"})
+
+
+class RetrievalService:
+    """Server asyncio di Unix socket dengan micro-batching ke functions.rag."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, batch_window: float = BATCH_WINDOW,
+                 batch_max: int = BATCH_MAX):
+        self.socket_path = socket_path
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self.queue = None
+        # Satu thread kerja: model embedding dipakai bergantian, bukan bersamaan
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval")
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0, "errors": 0}
+
+    async def serve(self):
+        from functions import rag
+
+        # Layanan ini selalu memakai model lokal, tidak pernah meneruskan ke dirinya sendiri
+        rag.RETRIEVAL_SOCKET = ""
+        self.rag = rag
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, rag.warmup)
+
+        self.queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path,
+                                            limit=MAX_REQUEST_BYTES)
+        os.chmod(self.socket_path, 0o660)
+        print(f"Layanan retrieval siap di {self.socket_path}")
+        batcher = asyncio.create_task(self._batch_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Baris melebihi MAX_REQUEST_BYTES; sisa buffer tidak bisa dipakai lagi
+                    writer.write((json.dumps({"error": "request terlalu besar"}) + "\n").encode("utf-8"))
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    response = {"error": "Request harus JSON satu baris"}
+                else:
+                    response = await self._dispatch(request)
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> dict:
+        self.stats["requests"] += 1
+        error = validate_request(request)
+        if error:
+            return {"error": error}
+        if request["op"] == "ping":
+            return {"ok": True, "index_version": self.rag.index_version(), "stats": self.stats,
+                    "cache": self.rag.cache_stats()}
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_max:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except TimeoutError:
+                    break
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            responses = await loop.run_in_executor(self.executor, self._process_batch, [r for r, _ in batch])
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def _process_batch(self, requests: list) -> list:
+        """Menjalankan satu batch request di thread kerja; urutan respons sama dengan request.
+
+        Semua teks embed digabung menjadi satu panggilan model, dan retrieval dikelompokkan
+        per k (satu retrieve_context_batch per kelompok). Jika satu kelompok gagal, request
+        di dalamnya dijalankan ulang satu per satu, sehingga error hanya sampai ke request
+        yang memang menyebabkannya.
+        """
+        responses = [None] * len(requests)
+        groups = [("embed", None, [i for i, request in enumerate(requests) if request["op"] == "embed"])]
+        by_k = {}
+        for i, request in enumerate(requests):
+            if request["op"] == "retrieve":
+                by_k.setdefault(request.get("k", 5), []).append(i)
+        groups.extend(("retrieve", k, indices) for k, indices in by_k.items())
+
+        for op, k, indices in groups:
+            if not indices:
+                continue
+            try:
+                self._run_group(op, k, [requests[i] for i in indices], indices, responses)
+                continue
+            except Exception as e:
+                if len(indices) == 1:
+                    self._record_error(e)
+                    responses[indices[0]] = {"error": str(e)}
+                    continue
+            for i in indices:
+                try:
+                    self._run_group(op, k, [requests[i]], [i], responses)
+                except Exception as e:
+                    self._record_error(e)
+                    responses[i] = {"error": str(e)}
+        return responses
+
+    def _run_group(self, op: str, k: int, requests: list, indices: list, responses: list):
+        """Satu panggilan model untuk sekelompok request; hasil dibagi kembali per request."""
+        field = "texts" if op == "embed" else "queries"
+        items = [item for request in requests for item in request[field]]
+        if op == "embed":
+            results = [list(map(float, v)) for v in self.rag.embed_documents(items)] if items else []
+        else:
+            results = [
+                [{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+                for docs in (self.rag.retrieve_context_batch(items, k=k) if items else [])
+            ]
+        key = "vectors" if op == "embed" else "documents"
+        offset = 0
+        for i, request in zip(indices, requests):
+            n = len(request[field])
+            responses[i] = {key: results[offset:offset + n]}
+            offset += n
+
+    def _record_error(self, error: Exception):
+        print(f"Error saat memproses batch retrieval: {error}")
+        self.stats["errors"] += 1
+
+
+def bench(socket_path: str, n_queries: int, concurrency: int, k: int):
+    """Mengirim query dari banyak thread ke layanan dan mencetak latensi serta ukuran batch."""
+    from benchmark import QUESTIONS_PATH, load_questions, latency_summary
+
+    questions = [item["question"] for item in load_questions(QUESTIONS_PATH)]
+    client = RetrievalClient(socket_path)
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        client.retrieve_batch([f"{questions[i % len(questions)]} {i}"], k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(n_queries)))
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    print(f"{n_queries} query, konkurensi {concurrency}: {n_queries / elapsed:.1f} q/s, "
+          f"p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms")
+    print(f"Layanan: {client.ping()['stats']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sidecar retrieval di Unix socket.")
+    parser.add_argument("command", nargs="?", choices=["serve", "bench"], default="serve")
+    parser.add_argument("--socket", default=os.getenv("RETRIEVAL_SOCKET") or DEFAULT_SOCKET_PATH)
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW * 1000)
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX)
+    parser.add_argument("--queries", type=int, default=200, help="Jumlah query untuk bench")
+    parser.add_argument("--concurrency", type=int, default=16, help="Jumlah thread untuk bench")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.socket, args.queries, args.concurrency, args.k)
+        return
+    service = RetrievalService(args.socket, batch_window=args.batch_window_ms / 1000, batch_max=args.batch_max)
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Index interval per hari untuk pertanyaan waktu dan ketersediaan ruang.
+
+Sumber data adalah tabel schedules (lewat schedule.load_schedules(), yang sudah di-cache
+per mtime database). Untuk setiap hari, sesi diurutkan menurut jam mulai; karena durasi
+sesi terbatas, sesi yang tumpang tindih dengan [a, b) pasti mulai di (a - durasi
+terpanjang, b), sehingga cukup satu bisect lalu memeriksa sedikit kandidat. Per ruang
+per hari disimpan juga interval terurut untuk mencari slot kosong.
+
+Waktu dinyatakan dalam menit sejak tengah malam (lihat schedule.parse_time).
+"""
+import bisect
+import threading
+from functions import schedule
+from functions.time_utils import current_day_minute
+
+# Jam operasional kampus untuk perhitungan slot kosong
+OPEN_TIME = 7 * 60
+CLOSE_TIME = 21 * 60
+
+
+class RoomIndex:
+    """Index interval atas baris jadwal (day, time_start, time_end, room, ...)."""
+
+    def __init__(self, rows: list):
+        self.rooms = sorted({row["room"] for row in rows})
+        self._days = {} # hari -> (starts, sessions, durasi terpanjang)
+        self._room_days = {} # (ruang, hari) -> [(mulai, selesai, sesi)] terurut
+        by_day = {}
+        for row in rows:
+            start, end = schedule.parse_time(row["time_start"]), schedule.parse_time(row["time_end"])
+            if start is None or end is None or end <= start:
+                continue
+            session = dict(row, _start=start, _end=end)
+            by_day.setdefault(row["day"], []).append(session)
+            self._room_days.setdefault((row["room"], row["day"]), []).append((start, end, session))
+        for day, sessions in by_day.items():
+            sessions.sort(key=lambda s: (s["_start"], s["_end"]))
+            self._days[day] = (
+                [s["_start"] for s in sessions],
+                sessions,
+                max(s["_end"] - s["_start"] for s in sessions),
+            )
+        for intervals in self._room_days.values():
+            intervals.sort(key=lambda item: (item[0], item[1]))
+
+    def overlapping(self, day: str, start: int, end: int) -> list:
+        """Sesi pada hari itu yang beririsan dengan [start, end)."""
+        entry = self._days.get(day)
+        if entry is None:
+            return []
+        starts, sessions, longest = entry
+        lo = bisect.bisect_right(starts, start - longest)
+        hi = bisect.bisect_left(starts, end)
+        return [s for s in sessions[lo:hi] if s["_end"] > start]
+
+    def at(self, day: str, minute: int) -> list:
+        """Sesi yang sedang berlangsung pada menit tersebut."""
+        return self.overlapping(day, minute, minute + 1)
+
+    def free_rooms(self, day: str, start: int, end: int) -> list:
+        """Ruang yang tidak dipakai sama sekali selama [start, end)."""
+        busy = {s["room"] for s in self.overlapping(day, start, end)}
+        return [room for room in self.rooms if room not in busy]
+
+    def free_slots(self, room: str, day: str, min_minutes: int = 1,
+                   open_time: int = OPEN_TIME, close_time: int = CLOSE_TIME) -> list:
+        """Celah kosong sebuah ruang pada hari itu sebagai [(mulai, selesai)] dalam jam operasional."""
+        slots, cursor = [], open_time
+        for start, end, _ in self._room_days.get((room, day), ()):
+            if start >= close_time:
+                break
+            if start - cursor >= min_minutes:
+                slots.append((cursor, start))
+            cursor = max(cursor, end)
+        if close_time - cursor >= min_minutes:
+            slots.append((cursor, close_time))
+        return slots
+
+    def room_sessions(self, room: str, day: str) -> list:
+        return [session for _, _, session in self._room_days.get((room, day), ())]
+
+
+_index = {"rows": None, "index": None}
+_index_lock = threading.Lock()
+
+
+def get_index() -> RoomIndex:
+    """RoomIndex untuk isi tabel schedules saat ini; dibangun ulang hanya jika datanya berubah."""
+    rows = schedule.load_schedules()
+    if _index["rows"] is not rows:
+        with _index_lock:
+            if _index["rows"] is not rows:
+                _index["index"], _index["rows"] = RoomIndex(rows), rows
+    return _index["index"]
+
+
+def _public(session: dict) -> dict:
+    return {key: value for key, value in session.items() if not key.startswith("_")}
+
+
+def _resolve_room(index: RoomIndex, room: str) -> str:
+    """Nama ruang persis dari sebutan bebas ("a101", "A101"); ValueError jika tidak ada/ambigu."""
+    needle = " ".join(room.lower().split())
+    exact = [name for name in index.rooms if name.lower() == needle]
+    candidates = exact or [name for name in index.rooms if needle in name.lower()]
+    if not candidates:
+        raise ValueError(f"Ruang '{room}' tidak ditemukan. Ruang yang ada: {', '.join(index.rooms)}")
+    if len(candidates) > 1:
+        raise ValueError(f"Ruang '{room}' ambigu, maksudnya salah satu dari: {', '.join(candidates)}")
+    return candidates[0]
+
+
+def availability(day: str = None, time: str = None, end_time: str = None, room: str = None,
+                 min_minutes: int = 30) -> dict:
+    """Jawaban untuk pertanyaan ketersediaan ruang / kuliah yang sedang berjalan.
+
+    Tanpa hari/jam dipakai waktu sekarang (time_utils.current_day_minute). Dengan end_time,
+    yang dicari adalah rentang [time, end_time); tanpa end_time, satu titik waktu.
+    Jika room diberikan, dikembalikan juga jadwal dan slot kosong ruang itu pada hari tersebut.
+    Raises ValueError jika hari, jam, atau ruang tidak dikenali.
+    """
+    now_day, now_minute = current_day_minute()
+    day_name = schedule.parse_day(day) if day else now_day
+    if day_name is None:
+        raise ValueError(f"Hari '{day}' tidak dikenali")
+    start = schedule.parse_time(time) if time else now_minute
+    if start is None:
+        raise ValueError(f"Jam '{time}' tidak dikenali, gunakan format JJ:MM")
+    end = schedule.parse_time(end_time) if end_time else start + 1
+    if end is None or end <= start:
+        raise ValueError(f"Jam selesai '{end_time}' tidak valid")
+
+    index = get_index()
+    result = {
+        "hari": day_name,
+        "mulai": schedule.format_time(start),
+        **({"selesai": schedule.format_time(end)} if end_time else {}),
+        "sedang_berlangsung": [_public(s) for s in index.overlapping(day_name, start, end)],
+        "ruang_kosong": index.free_rooms(day_name, start, end),
+    }
+    if room:
+        room_name = _resolve_room(index, room)
+        result["ruang"] = room_name
+        result["jadwal_ruang"] = [_public(s) for s in index.room_sessions(room_name, day_name)]
+        result["slot_kosong"] = [
+            f"{schedule.format_time(a)}-{schedule.format_time(b)}"
+            for a, b in index.free_slots(room_name, day_name, min_minutes=min_minutes)
+        ]
+    return result
+
+
+async def aavailability(**kwargs) -> dict:
+    """availability() di thread pool database; aman dipanggil dari event loop."""
+    return await schedule.run_in_db_thread(availability, **kwargs)
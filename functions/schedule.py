@@ -0,0 +1,415 @@
+"""Jadwal kuliah di tabel schedules (db/inara.sqlite3).
+
+- load_schedules()/find_schedules(): seluruh tabel di memori untuk router intent lokal.
+- query_schedules()/aquery_schedules(): lapisan akses data dengan filter di SQL, memakai
+  index (day, time_start), lecturer, dan class_name. Koneksi read-only dipakai ulang per
+  thread (statement yang sama otomatis di-cache sqlite3), dan versi async menjalankan
+  query di thread pool khusus sehingga event loop agent suara tidak pernah terblokir.
+- import_csv(): memuat CSV jadwal (Matkul, Dosen, Waktu, Ruang) ke tabel dalam satu
+  transaksi.
+
+    python -m functions.schedule import backend/data/scedule.csv
+"""
+import os
+import re
+import csv
+import sqlite3
+import asyncio
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functions.name_index import NameIndex
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+SCHEDULE_DB_PATH = os.getenv("SCHEDULE_DB_PATH", os.path.join(current_dir, "..", "db", "inara.sqlite3"))
+# Nama hari sesuai kolom day di tabel schedules, urut seperti datetime.weekday()
+DAYS = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+_DAY_PATTERN = re.compile(r"\b(senin|selasa|rabu|kamis|jum'?at|sabtu|minggu|hari ini|besok|lusa)\b")
+# Gelar akademik diabaikan saat mencocokkan nama dosen
+_TITLES = {"dr", "prof", "ir", "drs", "s.kom", "m.kom", "m.t", "ph.d"}
+_WAKTU_PATTERN = re.compile(r"^\s*([A-Za-z']+)\s+(\d{1,2})[:.](\d{2})\s*-\s*(\d{1,2})[:.](\d{2})\s*$")
+_TIME_PATTERN = re.compile(r"^\s*(\d{1,2})(?:[:.](\d{2}))?\s*$")
+DB_WORKERS = 2 # Thread untuk query async; masing-masing memegang koneksi sendiri
+# Kata yang diabaikan saat mencocokkan nama secara fuzzy (gelar, sapaan, kata sambung)
+_LECTURER_STOPWORDS = {"dr", "prof", "ir", "drs", "s", "kom", "m", "t", "ph", "d", "pak", "bapak", "bu", "ibu", "dosen"}
+_SUBJECT_STOPWORDS = {"dan", "mata", "kuliah", "matkul", "kelas"}
+# Panjang minimum value agar pencocokan substring langsung (skor 1.0) berlaku
+MIN_SUBSTRING_CHARS = 3
+# Kata umum pertanyaan jadwal; kata lain di query dianggap menyebut mata kuliah atau dosen
+_GENERIC_SCHEDULE_WORDS = {
+    "jadwal", "kuliah", "kelas", "matkul", "mata", "mengajar", "dosen", "hari", "ini", "apa", "saja",
+    "ada", "yang", "kapan", "jam", "berapa", "pukul", "di", "ruang", "mana", "siapa", "dan", "untuk",
+    "pada", "tanggal", "minggu", "sekarang", "nanti", "tolong", "dong", "ya", "nara", "mau", "tahu",
+    "lihat", "cek", "info", "saya", "aku", "pak", "bapak", "bu", "ibu", "semua", "lengkap",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_schedules_day_time ON schedules (day, time_start);
+CREATE INDEX IF NOT EXISTS idx_schedules_lecturer ON schedules (lecturer COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_schedules_class_name ON schedules (class_name COLLATE NOCASE);
+"""
+_INDEX_NAMES = {"idx_schedules_day_time", "idx_schedules_lecturer", "idx_schedules_class_name"}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day TEXT NOT NULL,
+    time_start TEXT NOT NULL,
+    time_end TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    room TEXT NOT NULL,
+    lecturer TEXT NOT NULL
+);
+""" + INDEXES
+_COLUMNS = "day, time_start, time_end, class_name, room, lecturer"
+# Urutan hari dihitung di SQL agar hasil terurut Senin..Minggu, bukan alfabetis
+_DAY_ORDER = "CASE day " + " ".join(f"WHEN '{day}' THEN {i}" for i, day in enumerate(DAYS)) + " ELSE 7 END"
+
+_cache = {"stat": None, "rows": []}
+_cache_lock = threading.Lock()
+_local = threading.local()
+_indexes_checked = set()
+_indexes_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_name_indexes = {"stat": None, "indexes": {}}
+_name_index_lock = threading.Lock()
+
+
+def load_schedules() -> list:
+    """Membaca seluruh tabel schedules ke memori; dibaca ulang hanya jika file database berubah.
+
+    Raises sqlite3.OperationalError jika database atau tabelnya belum ada.
+    """
+    try:
+        st = os.stat(SCHEDULE_DB_PATH)
+    except OSError:
+        raise sqlite3.OperationalError(_missing_database_message()) from None
+    stat_key = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        if stat_key != _cache["stat"]:
+            conn = _open_readonly()
+            try:
+                rows = [dict(row) for row in conn.execute(
+                    "SELECT day, time_start, time_end, class_name, room, lecturer FROM schedules"
+                )]
+            finally:
+                conn.close()
+            order = {day: i for i, day in enumerate(DAYS)}
+            rows.sort(key=lambda row: (order.get(row["day"], len(DAYS)), row["time_start"]))
+            _cache["rows"], _cache["stat"] = rows, stat_key
+        return _cache["rows"]
+
+
+def parse_day(text: str, today: datetime.date = None) -> str:
+    """Mengambil nama hari dari teks ("senin", "hari ini", "besok", ...); None jika tidak ada."""
+    match = _DAY_PATTERN.search(text.lower())
+    if not match:
+        return None
+    word = match.group(1)
+    offsets = {"hari ini": 0, "besok": 1, "lusa": 2}
+    if word in offsets:
+        today = today or datetime.date.today()
+        return DAYS[(today.weekday() + offsets[word]) % 7]
+    return "Jumat" if word.startswith("jum") else word.capitalize()
+
+
+def parse_time(text: str) -> int:
+    """"08:00", "8.00", atau "8" menjadi menit sejak tengah malam; None jika tidak valid."""
+    match = _TIME_PATTERN.match(text or "")
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def format_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_waktu(text: str) -> tuple:
+    """"Senin 08:00-09:40" menjadi ("Senin", 480, 580); None jika format tidak dikenali."""
+    match = _WAKTU_PATTERN.match(text or "")
+    if not match:
+        return None
+    day = parse_day(match.group(1))
+    if day is None:
+        return None
+    start = int(match.group(2)) * 60 + int(match.group(3))
+    end = int(match.group(4)) * 60 + int(match.group(5))
+    return day, start, end
+
+
+def _name_tokens(name: str) -> set:
+    tokens = {token.strip(".,") for token in name.lower().split()}
+    return {token for token in tokens if token and token not in _TITLES}
+
+
+def find_schedules(text: str) -> tuple:
+    """Mencari jadwal yang relevan dengan pertanyaan.
+
+    Filter hari diambil dari parse_day(); filter mata kuliah/dosen cocok jika nama mata
+    kuliah muncul utuh di teks atau salah satu nama dosen (tanpa gelar) disebut. Semua
+    jadwal (pada hari tersebut) hanya dikembalikan untuk pertanyaan umum ("jadwal hari
+    senin"); jika teks menyebut mata kuliah atau dosen yang tidak ada, hasilnya kosong.
+    Mengembalikan (hari atau None, daftar baris jadwal); hari None jika yang disebut tidak
+    ditemukan, agar jawabannya bukan "tidak ada jadwal pada hari itu".
+    """
+    query = text.lower()
+    query_tokens = set(re.findall(r"[a-z0-9]+", query))
+    day = parse_day(text)
+    rows = load_schedules()
+    if day:
+        rows = [row for row in rows if row["day"] == day]
+    subject = [
+        row for row in rows
+        if row["class_name"].lower() in query or _name_tokens(row["lecturer"]) & query_tokens
+    ]
+    if subject:
+        return day, subject
+    if _names_something(query):
+        return None, []
+    return day, rows
+
+
+def _names_something(query: str) -> bool:
+    """True jika query memuat kata selain hari dan kata umum pertanyaan jadwal."""
+    remaining = _DAY_PATTERN.sub(" ", query)
+    return any(token not in _GENERIC_SCHEDULE_WORDS for token in re.findall(r"[a-z]+", remaining))
+
+
+def format_schedules(day: str, rows: list) -> str:
+    """Menyusun jawaban teks dari baris jadwal."""
+    if not rows:
+        if day:
+            return f"Tidak ada jadwal kuliah pada hari {day}."
+        return "Maaf, saya tidak menemukan jadwal yang cocok. Sebutkan hari, mata kuliah, atau nama dosennya."
+    lines = [
+        f"- {row['day']} {row['time_start']}-{row['time_end']}: {row['class_name']} "
+        f"di {row['room']} ({row['lecturer']})"
+        for row in rows
+    ]
+    header = f"Jadwal kuliah hari {day}:" if day and all(row["day"] == day for row in rows) else "Jadwal kuliah:"
+    return "\n".join([header] + lines)
+
+
+def ensure_schema(db_path: str = None):
+    """Membuat tabel dan index jika belum ada; hanya untuk import dan perintah index."""
+    conn = sqlite3.connect(db_path or SCHEDULE_DB_PATH)
+    try:
+        conn.executescript(SCHEMA)
+    finally:
+        conn.close()
+
+
+def _missing_database_message(problem: str = "tidak ditemukan") -> str:
+    return (f"Database jadwal {SCHEDULE_DB_PATH} {problem}; "
+            f"jalankan: python -m functions.schedule import backend/data/scedule.csv")
+
+
+def _open_readonly(**kwargs) -> sqlite3.Connection:
+    """Membuka database jadwal read-only (mode=ro); file dan tabel tidak pernah dibuat di sini.
+
+    Raises sqlite3.OperationalError dengan pesan yang jelas jika file atau tabel schedules
+    belum ada, bukan database kosong yang dibuat diam-diam. Index yang belum ada dibuat
+    sekali per proses lewat _ensure_indexes().
+    """
+    if not os.path.exists(SCHEDULE_DB_PATH):
+        raise sqlite3.OperationalError(_missing_database_message())
+    conn = sqlite3.connect(f"file:{SCHEDULE_DB_PATH}?mode=ro", uri=True, **kwargs)
+    names = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE tbl_name = 'schedules' AND type IN ('table', 'index')"
+    )}
+    if "schedules" not in names:
+        conn.close()
+        raise sqlite3.OperationalError(_missing_database_message("belum berisi tabel schedules"))
+    if not _INDEX_NAMES <= names:
+        _ensure_indexes(SCHEDULE_DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _ensure_indexes(db_path: str):
+    """Membuat index yang belum ada (CREATE INDEX IF NOT EXISTS), sekali per proses per file.
+
+    Hanya dipanggil jika sqlite_master menunjukkan ada index yang hilang, sehingga database
+    yang sudah lengkap tidak pernah dibuka untuk ditulis. Jika file tidak bisa ditulis,
+    query tetap berjalan tanpa index dan peringatan dicetak.
+    """
+    with _indexes_lock:
+        if db_path in _indexes_checked:
+            return
+        _indexes_checked.add(db_path)
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True)
+            try:
+                conn.executescript(INDEXES)
+            finally:
+                conn.close()
+            print(f"Index tabel schedules dibuat di {db_path}")
+        except sqlite3.Error as e:
+            print(f"Peringatan: index jadwal tidak dapat dibuat di {db_path} ({e}); "
+                  f"jalankan: python -m functions.schedule index")
+
+
+def _connection() -> sqlite3.Connection:
+    """Koneksi read-only milik thread ini, dibuka sekali lalu dipakai ulang."""
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(SCHEDULE_DB_PATH)
+    if conn is None:
+        conn = conns[SCHEDULE_DB_PATH] = _open_readonly(cached_statements=64)
+    return conn
+
+
+def query_schedules(day: str = None, subject: str = None, lecturer: str = None, start_time: str = None) -> list:
+    """Jadwal yang cocok dengan semua filter, urut hari lalu jam mulai.
+
+    Hari menerima nama hari maupun "hari ini"/"besok"/"lusa"; jam mulai "08:00"/"8.00"/"8".
+    Mata kuliah dan dosen cocok sebagai bagian nama (tanpa membedakan huruf besar/kecil),
+    atau lewat match_names() jika transkrip salah eja. Raises ValueError jika hari atau jam
+    mulai tidak dikenali, sqlite3.OperationalError jika database jadwal belum ada.
+    """
+    clauses, params = [], []
+    if day:
+        day_name = parse_day(day)
+        if day_name is None:
+            raise ValueError(f"Hari '{day}' tidak dikenali")
+        clauses.append("day = ?")
+        params.append(day_name)
+    if start_time:
+        minutes = parse_time(start_time)
+        if minutes is None:
+            raise ValueError(f"Waktu mulai '{start_time}' tidak dikenali, gunakan format JJ:MM")
+        clauses.append("time_start = ?")
+        params.append(format_time(minutes))
+    # Kolom teks diselesaikan dulu ke nama yang benar-benar ada, lalu dicari lewat index
+    for column, value in (("class_name", subject), ("lecturer", lecturer)):
+        if value:
+            names = [name for name, _ in match_names(column, value)]
+            if not names:
+                return []
+            clauses.append(f"{column} COLLATE NOCASE IN ({', '.join('?' * len(names))})")
+            params.extend(names)
+
+    # Teks SQL hanya bergantung pada kombinasi filter, sehingga statement-nya ter-cache
+    sql = f"SELECT {_COLUMNS} FROM schedules"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {_DAY_ORDER}, time_start"
+    return [dict(row) for row in _connection().execute(sql, params)]
+
+
+def _get_name_indexes() -> dict:
+    """Index nama dosen dan mata kuliah; dibangun ulang hanya jika file database berubah."""
+    try:
+        st = os.stat(SCHEDULE_DB_PATH)
+        stat_key = (SCHEDULE_DB_PATH, st.st_mtime_ns, st.st_size)
+    except OSError:
+        stat_key = None
+    if stat_key is not None and stat_key == _name_indexes["stat"]:
+        return _name_indexes["indexes"]
+    with _name_index_lock:
+        if stat_key is None or stat_key != _name_indexes["stat"]:
+            conn = _connection()
+            indexes = {
+                "lecturer": NameIndex([row[0] for row in conn.execute("SELECT DISTINCT lecturer FROM schedules")],
+                                      _LECTURER_STOPWORDS),
+                "class_name": NameIndex([row[0] for row in conn.execute("SELECT DISTINCT class_name FROM schedules")],
+                                        _SUBJECT_STOPWORDS),
+            }
+            _name_indexes["indexes"], _name_indexes["stat"] = indexes, stat_key
+        return _name_indexes["indexes"]
+
+
+def match_names(column: str, value: str) -> list:
+    """Nama di kolom lecturer/class_name yang dimaksud value, sebagai [(nama, skor)].
+
+    Nama yang memuat value utuh di awal kata (tanpa membedakan huruf besar/kecil, minimal
+    MIN_SUBSTRING_CHARS huruf) diberi skor 1.0; jika tidak ada, dipakai pencocokan fuzzy
+    NameIndex (trigram + edit distance). Potongan pendek seperti "a" tidak cocok ke semua nama.
+    """
+    index = _get_name_indexes()[column]
+    needle = " ".join(value.lower().split())
+    exact = []
+    if len(needle) >= MIN_SUBSTRING_CHARS:
+        pattern = re.compile(r"\b" + re.escape(needle))
+        exact = [(name, 1.0) for name in index.names if pattern.search(name.lower())]
+    return exact or index.best_matches(value)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="schedule-db")
+    return _executor
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Menjalankan fungsi akses database jadwal di thread pool khusus, bukan di event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), lambda: func(*args, **kwargs))
+
+
+async def aquery_schedules(**filters) -> list:
+    """query_schedules() di thread pool; aman dipanggil dari event loop."""
+    return await run_in_db_thread(query_schedules, **filters)
+
+
+def import_csv(csv_path: str, db_path: str = None, replace: bool = True) -> int:
+    """Memuat CSV jadwal (Matkul, Dosen, Waktu, Ruang) ke tabel schedules dalam satu transaksi.
+
+    Jika replace, isi tabel lama diganti seluruhnya. Mengembalikan jumlah baris yang dimuat;
+    baris dengan kolom Waktu yang tidak dikenali dilewati dan dilaporkan.
+    """
+    db_path = db_path or SCHEDULE_DB_PATH
+    rows, skipped = [], []
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        for line_no, record in enumerate(csv.DictReader(f), start=2):
+            parsed = parse_waktu(record.get("Waktu", ""))
+            if parsed is None or not (record.get("Matkul") or "").strip():
+                skipped.append(line_no)
+                continue
+            day, start, end = parsed
+            rows.append((day, format_time(start), format_time(end), record["Matkul"].strip(),
+                         (record.get("Ruang") or "").strip(), (record.get("Dosen") or "").strip()))
+    if skipped:
+        print(f"Peringatan: baris {', '.join(map(str, skipped))} di {csv_path} dilewati (format Waktu tidak dikenali)")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM schedules")
+            conn.executemany(f"INSERT INTO schedules ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alat tabel jadwal kuliah (db/inara.sqlite3).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Muat CSV jadwal ke tabel schedules")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("--append", action="store_true", help="Tambahkan tanpa menghapus jadwal lama")
+    subparsers.add_parser("index", help="Buat index tabel schedules jika belum ada")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        count = import_csv(args.csv_path, replace=not args.append)
+        print(f"{count} jadwal dimuat ke {SCHEDULE_DB_PATH}")
+    else:
+        ensure_schema()
+        print(f"Index tabel schedules siap di {SCHEDULE_DB_PATH}")
+
+
+if __name__ == "__main__":
+    main()
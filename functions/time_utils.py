@@ -3,4 +3,11 @@ import datetime
 def get_current_time() -> str:
     """Mengembalikan waktu saat ini dalam format yang mudah dibaca."""
     now = datetime.datetime.now()
-    return now.strftime("%H:%M:%S pada %d %B %Y")
\ No newline at end of file
+    return now.strftime("%H:%M:%S pada %d %B %Y")
+
+def current_day_minute(now: datetime.datetime = None) -> tuple:
+    """Hari (nama Indonesia, mis. "Senin") dan menit sejak tengah malam saat ini."""
+    from functions.schedule import DAYS
+
+    now = now or datetime.datetime.now()
+    return DAYS[now.weekday()], now.hour * 60 + now.minute
@@ -0,0 +1,255 @@
+"""Tracing ringan: span bertingkat, log JSON, dan histogram bergaya Prometheus.
+
+Aktifkan dengan NARA_TRACE=1. Saat tidak aktif, span() mengembalikan context manager
+kosong yang sama setiap kali dan traced() mengembalikan fungsi aslinya, sehingga
+overhead-nya praktis nol.
+
+Saat aktif:
+- setiap span ditulis sebagai satu baris JSON ke NARA_TRACE_LOG (default logs/trace.jsonl)
+  berisi nama, durasi, atribut, trace_id, dan parent span;
+- durasi span serta nilai dari observe() masuk ke histogram, yang ditulis dalam format
+  teks Prometheus ke NARA_METRICS_FILE (default logs/metrics.prom) secara berkala dan
+  saat proses selesai. server.py juga menyajikannya di GET /metrics.
+"""
+import os
+import json
+import time
+import uuid
+import atexit
+import inspect
+import threading
+import functools
+import contextvars
+
+# Tentukan path absolut ke direktori skrip saat ini
+current_dir = os.path.dirname(os.path.abspath(__file__))
+TRACE_ENABLED = os.getenv("NARA_TRACE", "0").lower() in ("1", "true", "yes")
+TRACE_LOG_PATH = os.getenv("NARA_TRACE_LOG", os.path.join(current_dir, "..", "logs", "trace.jsonl"))
+METRICS_PATH = os.getenv("NARA_METRICS_FILE", os.path.join(current_dir, "..", "logs", "metrics.prom"))
+METRICS_FLUSH_INTERVAL = 15 # detik
+METRIC_PREFIX = "nara_"
+# Batas bucket histogram dalam detik
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histogram kumulatif dengan bucket tetap (format Prometheus)."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+_histograms = {} # (nama, label terurut) -> Histogram
+_counters = {} # (nama, label terurut) -> nilai
+_metrics_lock = threading.Lock()
+_log_lock = threading.Lock()
+_log_file = None
+_flusher = None
+_current_span = contextvars.ContextVar("nara_current_span", default=None)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    """Mencatat satu nilai (detik, atau satuan lain) ke histogram name."""
+    if not TRACE_ENABLED or value is None:
+        return
+    key = (name, _labels_key(labels))
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+    _ensure_flusher()
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Menambah counter name."""
+    if not TRACE_ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+    _ensure_flusher()
+
+
+def log_event(record: dict):
+    """Menulis satu baris JSON ke log trace."""
+    global _log_file
+    if not TRACE_ENABLED:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _log_lock:
+        try:
+            if _log_file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(TRACE_LOG_PATH)), exist_ok=True)
+                _log_file = open(TRACE_LOG_PATH, "a", encoding="utf-8", buffering=1)
+            _log_file.write(line + "\n")
+        except OSError as e:
+            print(f"Error saat menulis log trace: {e}")
+
+
+class Span:
+    """Span aktif; atribut bisa ditambah selama span berjalan lewat set()."""
+
+    __slots__ = ("name", "attrs", "span_id", "trace_id", "parent_id", "start", "_token")
+
+    def __init__(self, name: str, attrs: dict):
+        parent = _current_span.get()
+        self.name = name
+        self.attrs = attrs
+        self.span_id = uuid.uuid4().hex[:16]
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent else None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        status = "error" if exc_type is not None else "ok"
+        observe(f"{self.name}_seconds", duration)
+        log_event({
+            "ts": time.time(),
+            "span": self.name,
+            "duration_ms": round(duration * 1000, 3),
+            "status": status,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            **({"error": repr(exc)} if exc is not None else {}),
+            **self.attrs,
+        })
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """Context manager yang mengukur durasi blok sebagai span bernama name."""
+    if not TRACE_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+
+def traced(name: str = None):
+    """Decorator span untuk fungsi sync maupun async; tanpa efek jika tracing tidak aktif."""
+    def decorator(func):
+        if not TRACE_ENABLED:
+            return func
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Span(span_name, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_prometheus() -> str:
+    """Semua histogram dan counter dalam format teks eksposisi Prometheus."""
+    lines = []
+    with _metrics_lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+        seen = set()
+        for (name, labels), histogram in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} histogram")
+                seen.add(metric)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(labels, le='+Inf')} {histogram.count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name + "_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple, **extra) -> str:
+    items = list(labels) + [(key, str(value)) for key, value in extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def write_metrics_file(path: str = None):
+    """Menulis metrik ke file secara atomik (untuk textfile collector node_exporter)."""
+    if not TRACE_ENABLED:
+        return
+    path = os.path.abspath(path or METRICS_PATH)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saat menulis file metrik: {e}")
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        write_metrics_file()
+
+
+def _ensure_flusher():
+    """Menjalankan thread penulis file metrik (sekali per proses)."""
+    global _flusher
+    if _flusher is not None:
+        return
+    with _metrics_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+            _flusher.start()
+            atexit.register(write_metrics_file)
@@ -0,0 +1,107 @@
+"""Load test untuk server.py: banyak request /chat (SSE) bersamaan.
+
+Mengukur TTFT (waktu sampai chunk pertama diterima klien) dan total waktu per request,
+lalu melaporkan p50/p95, throughput, dan jumlah error/timeout. Pertanyaan diulang secara
+bergiliran, sehingga cache jawaban server dilewati (field "cache": false) kecuali dengan --use-cache.
+
+Contoh:
+    python server.py --llm stub --port 8080 &
+    python loadtest.py --url http://localhost:8080 --concurrency 32 --requests 500
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import aiohttp
+
+from benchmark import QUESTIONS_PATH, load_questions, percentile
+
+
+async def chat_once(session: aiohttp.ClientSession, url: str, query: str, use_cache: bool = False) -> dict:
+    """Mengirim satu query ke /chat dan membaca stream SSE sampai selesai."""
+    start = time.perf_counter()
+    ttft = None
+    event = None
+    async with session.post(f"{url}/chat", json={"query": query, "cache": use_cache}) as response:
+        if response.status != 200:
+            return {"ok": False, "error": f"HTTP {response.status}", "total": time.perf_counter() - start}
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "chunk" and ttft is None:
+                    ttft = time.perf_counter() - start
+                elif event == "error":
+                    data = json.loads(line[len("data:"):])
+                    return {"ok": False, "error": data.get("error"), "total": time.perf_counter() - start}
+    return {"ok": ttft is not None, "error": None if ttft is not None else "tanpa jawaban",
+            "ttft": ttft, "total": time.perf_counter() - start}
+
+
+async def run(url: str, queries: list, n_requests: int, concurrency: int, timeout: float,
+              use_cache: bool = False) -> dict:
+    results = []
+    next_request = iter(range(n_requests))
+
+    async def worker(session):
+        for i in next_request:
+            query = queries[i % len(queries)]
+            try:
+                results.append(await chat_once(session, url, query, use_cache=use_cache))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                results.append({"ok": False, "error": type(e).__name__, "total": None})
+
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=client_timeout, connector=connector) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    ttfts = sorted(r["ttft"] * 1000 for r in ok)
+    totals = sorted(r["total"] * 1000 for r in ok)
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else 0.0,
+        "ttft_ms": {"p50": percentile(ttfts, 50), "p95": percentile(ttfts, 95)},
+        "total_ms": {"p50": percentile(totals, 50), "p95": percentile(totals, 95)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test server HTTP asisten Nara.")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--concurrency", type=int, default=16, help="Jumlah klien bersamaan")
+    parser.add_argument("--requests", type=int, default=200, help="Total request")
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout klien per request (detik)")
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="File JSON pertanyaan")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Izinkan cache jawaban server (default: dilewati agar yang diukur adalah LLM)")
+    args = parser.parse_args(argv)
+
+    queries = [item["question"] for item in load_questions(args.questions)]
+    random.Random(args.seed).shuffle(queries)
+    report = asyncio.run(run(args.url.rstrip("/"), queries, args.requests, args.concurrency, args.timeout,
+                             use_cache=args.use_cache))
+
+    print(f"{report['ok']}/{report['requests']} request berhasil dalam {report['seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s, konkurensi {args.concurrency})")
+    print(f"TTFT : p50 {report['ttft_ms']['p50']:.0f} ms, p95 {report['ttft_ms']['p95']:.0f} ms")
+    print(f"Total: p50 {report['total_ms']['p50']:.0f} ms, p95 {report['total_ms']['p95']:.0f} ms")
+    if report["errors"]:
+        print(f"Error: {report['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,177 @@
+import time
+_STARTUP_BEGIN = time.perf_counter()
+
 import os
-import re
+import sys
+import argparse
+import asyncio
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
-from functions.rag import retrieve_context
+from functions.rag import retrieve_context, preload_async, index_version, embed_query, embed_documents
+from functions.context_packing import pack_context, CANDIDATE_CHUNKS, CONTEXT_TOKEN_BUDGET
+from functions.answer_cache import get_answer_cache
 from functions.time_utils import get_current_time
+from functions.intent_router import route
+from functions.tracing import span, observe, increment, log_event
+from functions.llm_scheduler import get_scheduler, LLMOverloaded
 
 # Load environment variables
 load_dotenv()
 
 # Configure Google Gemini API Key
 api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    print("Error: GOOGLE_API_KEY tidak ditemukan di file .env")
-    print("Silakan buat file .env di root project dan tambahkan GOOGLE_API_KEY=API_KEY_ANDA")
-    exit()
 
-# Initialize Gemini client
-client = genai.Client(api_key=api_key)
+# Initialize Gemini client (None jika API key belum diatur; main() dan server.py memeriksanya)
+client = genai.Client(api_key=api_key) if api_key else None
 
-def generate_response(query: str) -> str:
-    """Generate response using Gemini with tools."""
-    model = "gemini-2.0-flash"
-    
-    # Get context from RAG if needed
-    relevant_docs = retrieve_context(query, k=3)
-    context_str = "\n\n".join([doc.page_content for doc in relevant_docs]) if relevant_docs else ""
-    
-    # Define tools
-    tools = [
-        types.Tool(
-            function_declarations=[
-                types.FunctionDeclaration(
-                    name="RAG",
-                    description="Query campus information from knowledge base",
-                    parameters={
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "The query to search in the knowledge base"
-                            }
-                        },
-                        "required": ["query"]
-                    }
-                ),
-                types.FunctionDeclaration(
-                    name="Time",
-                    description="Get current time",
-                    parameters={
-                        "type": "object",
-                        "properties": {},
-                        "required": []
-                    }
-                )
-            ]
-        )
-    ]
+def require_api_key():
+    """Menghentikan program jika GOOGLE_API_KEY belum diatur."""
+    if not api_key:
+        print("Error: GOOGLE_API_KEY tidak ditemukan di file .env")
+        print("Silakan buat file .env di root project dan tambahkan GOOGLE_API_KEY=API_KEY_ANDA")
+        exit()
 
-    # Configure generation settings
-    generate_content_config = types.GenerateContentConfig(
-        tools=tools,
-        response_mime_type="text/plain",
-        system_instruction=[
-            types.Part.from_text(text="""Anda adalah Nara, staf Tata Usaha (TU) virtual yang ramah dan siap membantu memberikan informasi seputar kampus.
-Jawab pertanyaan berikut berdasarkan konteks yang diberikan. Jika konteks tidak cukup, jawab berdasarkan pengetahuan umum Anda sebagai Nara, dan jika perlu, sebutkan bahwa informasi spesifik tidak ada dalam data yang saya miliki saat ini.
+MODEL = "gemini-2.0-flash"
+# Batas jumlah putaran pemanggilan tool sebelum model dipaksa menjawab
+MAX_TOOL_ROUNDS = 3
+# Jawaban saat antrean LLM penuh (load shedding)
+OVERLOAD_MESSAGE = "Maaf, Nara sedang melayani banyak permintaan. Silakan coba lagi sebentar lagi."
+OVERLOAD_SNIPPET_CHARS = 400
+# Jawaban jika model masih meminta tool setelah MAX_TOOL_ROUNDS putaran
+NO_ANSWER_MESSAGE = "Maaf, saya belum bisa menemukan jawaban untuk pertanyaan tersebut."
+# Jawaban yang memakai tool ini bergantung pada waktu, sehingga tidak disimpan di cache jawaban
+UNCACHEABLE_TOOLS = {"Time"}
 
-Konteks:
-{context_str}
+SYSTEM_INSTRUCTION = """Anda adalah Nara, staf Tata Usaha (TU) virtual yang ramah dan siap membantu memberikan informasi seputar kampus.
+Gunakan tool RAG untuk mencari informasi kampus di basis pengetahuan dan tool Time untuk mengetahui waktu saat ini.
+Jawab pertanyaan berdasarkan hasil tool tersebut. Jika hasil tool tidak cukup, jawab berdasarkan pengetahuan umum Anda sebagai Nara, dan jika perlu, sebutkan bahwa informasi spesifik tidak ada dalam data yang saya miliki saat ini."""
 
-Pertanyaan: {query}""")
+# Define tools
+TOOLS = [
+    types.Tool(
+        function_declarations=[
+            types.FunctionDeclaration(
+                name="RAG",
+                description="Query campus information from knowledge base",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "The query to search in the knowledge base"
+                        }
+                    },
+                    "required": ["query"]
+                }
+            ),
+            types.FunctionDeclaration(
+                name="Time",
+                description="Get current time",
+                parameters={
+                    "type": "object",
+                    "properties": {},
+                    "required": []
+                }
+            )
         ]
     )
+]
+
+# Configure generation settings
+GENERATE_CONFIG = types.GenerateContentConfig(
+    tools=TOOLS,
+    response_mime_type="text/plain",
+    system_instruction=[types.Part.from_text(text=SYSTEM_INSTRUCTION)],
+)
+# Putaran terakhir: tool dimatikan agar model memberikan jawaban akhir
+FINAL_ROUND_CONFIG = types.GenerateContentConfig(
+    tools=TOOLS,
+    tool_config=types.ToolConfig(
+        function_calling_config=types.FunctionCallingConfig(mode="NONE")
+    ),
+    response_mime_type="text/plain",
+    system_instruction=[types.Part.from_text(text=SYSTEM_INSTRUCTION)],
+)
+
+def tool_rag(args: dict) -> dict:
+    """Tool RAG: mengambil potongan dokumen relevan dari basis pengetahuan.
+
+    Kandidat disusun oleh pack_context: urutan retrieval dipertahankan, near-duplicate
+    dibuang, chunk bertetangga digabung tanpa overlap, dan konteks tidak pernah lebih besar
+    dari 3 chunk lama (MAX_CONTEXT_CHUNKS dan CONTEXT_TOKEN_BUDGET di context_packing).
+    """
+    query = args.get("query", "")
+    docs = retrieve_context(query, k=CANDIDATE_CHUNKS)
+    blocks, stats = pack_context(docs, CONTEXT_TOKEN_BUDGET, embed_documents=embed_documents)
+    print(f"Konteks: {stats['chunks_used']}/{stats['chunks_in']} chunk -> {len(blocks)} blok, "
+          f"{stats['packed_tokens']} token (hemat {stats['tokens_saved']} token dari {stats['raw_tokens']})")
+    return {
+        "documents": [
+            {"source": block["source"], "content": block["content"]}
+            for block in blocks
+        ]
+    }
+
+def tool_time(args: dict) -> dict:
+    """Tool Time: mengembalikan waktu saat ini."""
+    return {"time": get_current_time()}
+
+TOOL_HANDLERS = {
+    "RAG": tool_rag,
+    "Time": tool_time,
+}
+
+# Tool dijalankan paralel; retrieval dan waktu tidak saling bergantung
+_tool_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
+
+def _run_tool(function_call) -> dict:
+    handler = TOOL_HANDLERS.get(function_call.name)
+    if handler is None:
+        return {"error": f"Tool '{function_call.name}' tidak dikenal."}
+    try:
+        with span("tool", tool=function_call.name):
+            return handler(dict(function_call.args or {}))
+    except Exception as e:
+        print(f"Error saat menjalankan tool {function_call.name}: {e}")
+        return {"error": str(e)}
 
+def tool_response_parts(function_calls: list, results: list) -> list:
+    """Hasil tool sebagai Part function response, urut sesuai function call."""
+    return [
+        types.Part.from_function_response(name=call.name, response=result)
+        for call, result in zip(function_calls, results)
+    ]
+
+def execute_tool_calls(function_calls: list) -> list:
+    """Menjalankan semua function call secara paralel dan mengembalikan Part function response."""
+    futures = [_tool_executor.submit(_run_tool, call) for call in function_calls]
+    return tool_response_parts(function_calls, [future.result() for future in futures])
+
+async def aexecute_tool_calls(function_calls: list) -> list:
+    """Versi async execute_tool_calls: tool dijalankan di thread agar event loop tidak terblokir."""
+    results = await asyncio.gather(*(asyncio.to_thread(_run_tool, call) for call in function_calls))
+    return tool_response_parts(function_calls, results)
+
+def overload_answer(query: str) -> str:
+    """Jawaban cepat tanpa LLM saat antrean penuh: cuplikan dokumen paling relevan."""
+    try:
+        docs = retrieve_context(query, k=1)
+    except Exception as e:
+        print(f"Error saat retrieval untuk jawaban cadangan: {e}")
+        docs = []
+    if not docs:
+        return OVERLOAD_MESSAGE
+    source = docs[0].metadata.get("source", "N/A")
+    snippet = docs[0].page_content[:OVERLOAD_SNIPPET_CHARS].strip()
+    return f"{OVERLOAD_MESSAGE} Sementara itu, berikut informasi yang paling relevan dari {source}:\n{snippet}"
+
+def initial_contents(query: str) -> list:
+    """Isi percakapan awal untuk model: satu giliran user berisi query."""
     # Create content for the model
-    contents = [
+    return [
         types.Content(
             role="user",
             parts=[
@@ -83,41 +180,226 @@ Pertanyaan: {query}""")
         )
     ]
 
+def round_config(round_number: int) -> types.GenerateContentConfig:
+    """Konfigurasi untuk putaran ke-n; putaran terakhir tanpa function calling."""
+    return GENERATE_CONFIG if round_number < MAX_TOOL_ROUNDS else FINAL_ROUND_CONFIG
+
+def append_tool_round(contents: list, text_parts: list, function_calls: list, response_parts: list):
+    """Menambahkan giliran model (beserta function call) dan hasil tool ke percakapan."""
+    model_parts = [types.Part.from_text(text="".join(text_parts))] if text_parts else []
+    model_parts.extend(types.Part(function_call=call) for call in function_calls)
+    contents.append(types.Content(role="model", parts=model_parts))
+    contents.append(types.Content(role="user", parts=response_parts))
+
+def record_generation(query: str, metrics: dict):
+    """Mencatat TTFT, total waktu, dan putaran tool satu jawaban ke histogram dan log trace."""
+    observe("llm_ttft_seconds", metrics.get("ttft"), cached=metrics.get("cached", False))
+    observe("generate_response_seconds", metrics.get("total"), cached=metrics.get("cached", False))
+    increment("generate_response", cached=metrics.get("cached", False))
+    increment("tool_rounds", metrics.get("tool_rounds", 0))
+    log_event({"ts": time.time(), "event": "generate_response", "query_chars": len(query), **metrics})
+
+class ResponseTurn:
+    """Status satu jawaban, dipakai bersama generate_response_stream dan agenerate_response_stream.
+
+    Menyimpan metrics, cache jawaban, isi percakapan, dan tool yang sudah dipakai, sehingga
+    kedua varian hanya berbeda pada cara memanggil LLM dan menjalankan tool. Method yang
+    bisa memanggil model embedding (cached_answer, store_answer) bersifat blocking.
+    Dengan use_cache=False cache jawaban tidak dibaca maupun ditulis.
+    """
+
+    def __init__(self, query: str, metrics: dict = None, use_cache: bool = True):
+        self.query = query
+        self.metrics = metrics if metrics is not None else {}
+        self.metrics.update(ttft=None, total=None, tool_rounds=0, cached=False)
+        self.start = time.perf_counter()
+        self.answer_cache = get_answer_cache() if use_cache else None
+        self.kb_version = index_version()
+        self.contents = initial_contents(query)
+        self.used_tools = set()
+        self.answer_parts = []
+
+    def emit(self, text: str) -> str:
+        """Mencatat TTFT saat teks pertama keluar, lalu mengembalikan teks itu."""
+        if self.metrics["ttft"] is None:
+            self.metrics["ttft"] = time.perf_counter() - self.start
+        return text
+
+    def cached_answer(self) -> str:
+        """Jawaban dari cache untuk query ini (None jika tidak ada atau cache dimatikan)."""
+        if self.answer_cache is None:
+            return None
+        answer = self.answer_cache.get(self.query, self.kb_version, embed=embed_query)
+        if answer is not None:
+            self.metrics["cached"] = True
+        return answer
+
+    def add_chunk(self, chunk, text_parts: list, function_calls: list) -> str:
+        """Memilah satu chunk stream; mengembalikan teks yang perlu di-yield (atau None)."""
+        if chunk.function_calls:
+            function_calls.extend(chunk.function_calls)
+            return None
+        if chunk.text:
+            text_parts.append(chunk.text)
+            self.answer_parts.append(chunk.text)
+            return self.emit(chunk.text)
+        return None
+
+    def end_round(self, round_start: float, function_calls: list) -> bool:
+        """Mencatat satu putaran LLM; True jika model sudah memberikan jawaban akhir."""
+        observe("llm_round_seconds", time.perf_counter() - round_start, final=not function_calls)
+        if not function_calls:
+            return True
+        self.metrics["tool_rounds"] += 1
+        self.used_tools.update(call.name for call in function_calls)
+        return False
+
+    def add_tool_round(self, text_parts: list, function_calls: list, response_parts: list):
+        append_tool_round(self.contents, text_parts, function_calls, response_parts)
+
+    def store_answer(self):
+        """Menyimpan jawaban ke cache, kecuali jawaban bergantung pada tool yang tidak bisa di-cache."""
+        answer = "".join(self.answer_parts)
+        if self.answer_cache is not None and answer and not self.used_tools & UNCACHEABLE_TOOLS:
+            self.answer_cache.put(self.query, self.kb_version, answer, embed=embed_query)
+
+    def error_message(self, error: Exception) -> str:
+        print(f"Error saat memanggil LLM: {error}")
+        increment("llm_errors", error=type(error).__name__)
+        return "Maaf, terjadi kesalahan saat mencoba menghasilkan respons."
+
+    def finish(self):
+        self.metrics["total"] = time.perf_counter() - self.start
+        record_generation(self.query, self.metrics)
+
+def generate_response_stream(query: str, metrics: dict = None, llm=None, use_cache: bool = True):
+    """Generator jawaban Gemini dengan tools; teks di-yield segera setelah chunk tiba.
+
+    Function call dari model dijalankan (paralel) dan hasilnya dikirim kembali ke model,
+    paling banyak MAX_TOOL_ROUNDS putaran, sampai model memberikan jawaban teks.
+    Pertanyaan yang sama (atau mirip) pada versi knowledge base yang sama dijawab dari cache.
+
+    Jika metrics (dict) diberikan, diisi dengan ttft (detik hingga teks pertama), total,
+    tool_rounds, dan cached. llm dapat diganti dengan client lain (misalnya stub lokal);
+    use_cache=False mematikan cache jawaban (misalnya saat load test dengan stub).
+    """
+    llm = llm or client
+    turn = ResponseTurn(query, metrics, use_cache=use_cache)
+    cached_answer = turn.cached_answer()
+    if cached_answer is not None:
+        yield turn.emit(cached_answer)
+        turn.finish()
+        return
+
+    scheduler = get_scheduler()
     try:
-        # Generate response
-        response = ""
-        for chunk in client.models.generate_content_stream(
-            model=model,
-            contents=contents,
-            config=generate_content_config
-        ):
-            if chunk.function_calls:
-                # Handle function calls
-                for func_call in chunk.function_calls:
-                    if func_call.name == "RAG":
-                        # Process RAG query
-                        rag_results = retrieve_context(func_call.args.get("query", ""), k=3)
-                        response += "\n".join([doc.page_content for doc in rag_results])
-                    elif func_call.name == "Time":
-                        # Get current time
-                        response += get_current_time()
-            else:
-                response += chunk.text
-        return response
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            text_parts, function_calls = [], []
+            round_start = time.perf_counter()
+            for chunk in scheduler.stream(llm, MODEL, turn.contents, round_config(round_number)):
+                text = turn.add_chunk(chunk, text_parts, function_calls)
+                if text:
+                    yield text
+            if turn.end_round(round_start, function_calls):
+                turn.store_answer()
+                break
+            turn.add_tool_round(text_parts, function_calls, execute_tool_calls(function_calls))
+        else:
+            yield turn.emit(NO_ANSWER_MESSAGE)
+    except LLMOverloaded:
+        turn.metrics["shed"] = True
+        yield turn.emit(overload_answer(query))
     except Exception as e:
-        print(f"Error saat memanggil LLM: {e}")
-        return "Maaf, terjadi kesalahan saat mencoba menghasilkan respons."
+        yield turn.emit(turn.error_message(e))
+    turn.finish()
+
+async def agenerate_response_stream(query: str, metrics: dict = None, llm=None, use_cache: bool = True):
+    """Versi asyncio dari generate_response_stream memakai client async (llm.aio).
+
+    Tool dan cache jawaban (yang bisa memanggil model embedding) dijalankan di thread
+    terpisah agar event loop tidak terblokir.
+    """
+    llm = llm or client
+    turn = ResponseTurn(query, metrics, use_cache=use_cache)
+    cached_answer = await asyncio.to_thread(turn.cached_answer)
+    if cached_answer is not None:
+        yield turn.emit(cached_answer)
+        turn.finish()
+        return
+
+    scheduler = get_scheduler()
+    try:
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            text_parts, function_calls = [], []
+            round_start = time.perf_counter()
+            async for chunk in scheduler.astream(llm, MODEL, turn.contents, round_config(round_number)):
+                text = turn.add_chunk(chunk, text_parts, function_calls)
+                if text:
+                    yield text
+            if turn.end_round(round_start, function_calls):
+                await asyncio.to_thread(turn.store_answer)
+                break
+            turn.add_tool_round(text_parts, function_calls, await aexecute_tool_calls(function_calls))
+        else:
+            yield turn.emit(NO_ANSWER_MESSAGE)
+    except LLMOverloaded:
+        turn.metrics["shed"] = True
+        yield turn.emit(await asyncio.to_thread(overload_answer, query))
+    except Exception as e:
+        yield turn.emit(turn.error_message(e))
+    turn.finish()
+
+def generate_response(query: str) -> str:
+    """Generate response using Gemini with tools."""
+    return "".join(generate_response_stream(query))
+
+def profile_startup(top: int = 15):
+    """Menampilkan laporan waktu import modul (python -X importtime) untuk main.py."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            entries.append((int(parts[1]), int(parts[0]), parts[2].rstrip()))
+        except ValueError:
+            continue
+
+    print(f"\nWaktu startup proses ini hingga main(): {(time.perf_counter() - _STARTUP_BEGIN) * 1000:.1f} ms")
+    print(f"Top {top} import berdasarkan waktu kumulatif:")
+    print(f"{'kumulatif (ms)':>15} {'self (ms)':>10}  modul")
+    for cumulative, self_time, name in sorted(entries, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>15.1f} {self_time / 1000:>10.1f}  {name}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Nara, asisten informasi kampus.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Tampilkan laporan waktu import modul lalu keluar")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Jangan memuat model RAG di latar belakang saat startup")
+    args = parser.parse_args()
+
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    require_api_key()
+
+    # Muat model embedding dan vector store di latar belakang agar prompt langsung muncul
+    if not args.no_preload:
+        preload_async()
+
     print("\nSelamat datang! Saya Nara, staf TU virtual Anda.")
-    print("Ada yang bisa saya bantu terkait informasi kampus? Anda juga bisa menanyakan waktu saat ini.")
+    print("Ada yang bisa saya bantu terkait informasi kampus? Anda juga bisa menanyakan waktu atau jadwal kuliah.")
     print("Ketik 'quit' atau 'exit' untuk keluar.")
 
-    # Daftar sapaan umum
-    sapaan = ["halo", "hai", "hi", "selamat pagi", "selamat siang", "selamat sore", "selamat malam"]
-    # Pola regex untuk mendeteksi pertanyaan waktu
-    pola_waktu = r"(jam berapa|waktu sekarang|tanggal berapa|hari apa)"
-
     while True:
         query = input("\nAnda: ").lower().strip()
 
@@ -128,19 +410,24 @@ def main():
         if not query:
             continue
 
-        # 1. Cek Sapaan
-        if any(s in query for s in sapaan) and len(query.split()) <= 3:
-            print("\nNara: Halo! Ada yang bisa saya bantu terkait informasi kampus atau waktu saat ini?")
-        # 2. Cek Pertanyaan Waktu
-        elif re.search(pola_waktu, query):
-            print("\nNara: Tentu, saya cek waktu sekarang...")
-            waktu_sekarang = get_current_time()
-            print(f"Nara: Sekarang pukul {waktu_sekarang}.")
-        # 3. Anggap Pertanyaan Informasi Kampus
+        # 1. Sapaan, waktu, dan jadwal dijawab lokal oleh router intent
+        route_metrics = {}
+        local_answer = route(query, metrics=route_metrics)
+        if local_answer is not None:
+            print(f"\nNara: {local_answer}")
+            print(f"[intent {route_metrics['intent']} ({route_metrics['method']}), "
+                  f"{route_metrics['seconds'] * 1000:.1f} ms]")
+        # 2. Anggap Pertanyaan Informasi Kampus
         else:
             print("\nNara: Baik, saya coba carikan informasinya untuk Anda...")
-            response = generate_response(query)
-            print(f"Nara: {response}")
+            print("Nara: ", end="", flush=True)
+            metrics = {}
+            for text in generate_response_stream(query, metrics=metrics):
+                print(text, end="", flush=True)
+            print()
+            if metrics["ttft"] is not None:
+                print(f"[TTFT {metrics['ttft']:.2f}s, total {metrics['total']:.2f}s, "
+                      f"{metrics['tool_rounds']} putaran tool{', dari cache' if metrics['cached'] else ''}]")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
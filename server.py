@@ -0,0 +1,262 @@
+"""Mode server asyncio untuk asisten teks Nara (HTTP SSE + WebSocket).
+
+Endpoint:
+    GET  /health            status server, jumlah request aktif, statistik cache
+    POST /chat              body {"query": "...", "cache": false}; jawaban di-stream sebagai Server-Sent Events
+    GET  /metrics           metrik format Prometheus (isi saat NARA_TRACE=1)
+    GET  /ws                WebSocket; kirim {"query": "..."}, terima chunk {"type": "chunk"} lalu {"type": "done"}
+
+Field "cache" opsional (default true); false melewati cache jawaban untuk request itu.
+Dengan --llm stub cache jawaban dimatikan, agar load test tidak mengukur cache hit.
+
+Contoh:
+    python server.py --port 8080                 # memakai Gemini (butuh GOOGLE_API_KEY)
+    python server.py --llm stub                  # LLM stub lokal, untuk load test offline
+    python loadtest.py --url http://localhost:8080 --concurrency 32 --requests 500
+"""
+import json
+import time
+import asyncio
+import argparse
+from aiohttp import web, WSMsgType
+
+import main as assistant
+from functions import rag
+from functions.intent_router import route
+from functions import tracing
+from functions.llm_scheduler import get_scheduler
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8080
+MAX_CONCURRENCY = 16 # Jumlah generasi yang berjalan bersamaan; sisanya menunggu antrean
+REQUEST_TIMEOUT = 60 # detik per request
+MAX_QUERY_LENGTH = 2000
+
+
+class AssistantServer:
+    """Membungkus agenerate_response_stream dengan batas konkurensi dan timeout."""
+
+    def __init__(self, llm, max_concurrency: int = MAX_CONCURRENCY, request_timeout: float = REQUEST_TIMEOUT,
+                 use_answer_cache: bool = True):
+        self.llm = llm
+        self.use_answer_cache = use_answer_cache
+        self.request_timeout = request_timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"requests": 0, "local": 0, "completed": 0, "timeouts": 0, "errors": 0}
+
+    async def stream(self, query: str, metrics: dict, use_cache: bool = True):
+        """Generator async chunk jawaban; menunggu slot konkurensi lalu menerapkan timeout.
+
+        Cache jawaban dipakai hanya jika diizinkan oleh request (use_cache) dan server.
+
+        Sapaan, waktu, dan jadwal dijawab lokal oleh router intent tanpa memakai slot LLM.
+        """
+        self.stats["requests"] += 1
+        route_metrics = {}
+        local_answer = await asyncio.to_thread(route, query, route_metrics)
+        if local_answer is not None:
+            self.stats["local"] += 1
+            metrics.update(ttft=route_metrics["seconds"], total=route_metrics["seconds"],
+                           tool_rounds=0, cached=False, intent=route_metrics["intent"])
+            yield local_answer
+            return
+        self.waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        metrics["queue_seconds"] = time.perf_counter() - queued_at
+        self.active += 1
+        try:
+            answer = assistant.agenerate_response_stream(
+                query, metrics=metrics, llm=self.llm, use_cache=use_cache and self.use_answer_cache)
+            async for text in self._with_deadline(answer):
+                yield text
+            self.stats["completed"] += 1
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def _with_deadline(self, chunks):
+        """Meneruskan chunk dengan batas request_timeout untuk waktu menunggu generator saja.
+
+        Yield dilakukan di luar scope timeout: waktu klien membaca chunk tidak dihitung, dan
+        TimeoutError selalu dilempar di sini (bukan sebagai pembatalan task handler), sehingga
+        handler bisa mengirim event error "timeout".
+        """
+        loop = asyncio.get_running_loop()
+        remaining = self.request_timeout
+        try:
+            while True:
+                started = loop.time()
+                try:
+                    text = await asyncio.wait_for(anext(chunks), max(remaining, 0))
+                except StopAsyncIteration:
+                    return
+                remaining -= loop.time() - started
+                yield text
+        finally:
+            await chunks.aclose()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "stats": self.stats,
+            "retrieval_cache": rag.cache_stats(),
+            "llm_scheduler": get_scheduler().stats,
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=tracing.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        """POST /chat: jawaban di-stream sebagai Server-Sent Events."""
+        try:
+            payload = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise web.HTTPBadRequest(text="Body harus JSON: {\"query\": \"...\"}")
+        query = _validate_query(payload)
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+        })
+        await response.prepare(request)
+        metrics = {}
+        try:
+            async for text in self.stream(query, metrics, use_cache=_wants_cache(payload)):
+                await response.write(_sse("chunk", {"text": text}))
+            await response.write(_sse("done", metrics))
+        except TimeoutError:
+            await response.write(_sse("error", {"error": "timeout", "metrics": metrics}))
+        except Exception as e:
+            print(f"Error saat menjawab request: {e}")
+            await response.write(_sse("error", {"error": "internal", "metrics": metrics}))
+        await response.write_eof()
+        return response
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        """GET /ws: satu koneksi dapat mengirim banyak query secara berurutan."""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                if message.type == WSMsgType.ERROR:
+                    break
+                continue
+            try:
+                payload = json.loads(message.data)
+                query = _validate_query(payload)
+            except (json.JSONDecodeError, web.HTTPBadRequest) as e:
+                await ws.send_json({"type": "error", "error": getattr(e, "text", None) or str(e)})
+                continue
+
+            metrics = {}
+            try:
+                async for text in self.stream(query, metrics, use_cache=_wants_cache(payload)):
+                    await ws.send_json({"type": "chunk", "text": text})
+                await ws.send_json({"type": "done", "metrics": metrics})
+            except TimeoutError:
+                await ws.send_json({"type": "error", "error": "timeout", "metrics": metrics})
+            except Exception as e:
+                print(f"Error saat menjawab request: {e}")
+                await ws.send_json({"type": "error", "error": "internal", "metrics": metrics})
+        return ws
+
+
+def _validate_query(payload) -> str:
+    query = payload.get("query") if isinstance(payload, dict) else None
+    if not isinstance(query, str) or not query.strip():
+        raise web.HTTPBadRequest(text="Field 'query' wajib diisi.")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise web.HTTPBadRequest(text=f"Query maksimal {MAX_QUERY_LENGTH} karakter.")
+    return query.strip()
+
+
+def _wants_cache(payload: dict) -> bool:
+    """Field opsional "cache"; hanya nilai false yang mematikan cache jawaban."""
+    return payload.get("cache", True) is not False
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def create_app(llm, max_concurrency: int = MAX_CONCURRENCY, request_timeout: float = REQUEST_TIMEOUT,
+               warmup: bool = True, use_answer_cache: bool = None) -> web.Application:
+    """Membuat aplikasi aiohttp; model embedding dimuat sekali dan dipakai semua request.
+
+    use_answer_cache=None berarti cache jawaban aktif, kecuali jika llm adalah stub lokal.
+    """
+    if use_answer_cache is None:
+        use_answer_cache = not _is_stub(llm)
+    server = AssistantServer(llm, max_concurrency=max_concurrency, request_timeout=request_timeout,
+                             use_answer_cache=use_answer_cache)
+    app = web.Application()
+    app["assistant"] = server
+    app.router.add_get("/health", server.handle_health)
+    app.router.add_get("/metrics", server.handle_metrics)
+    app.router.add_post("/chat", server.handle_chat)
+    app.router.add_get("/ws", server.handle_ws)
+
+    async def on_startup(app):
+        if warmup:
+            await asyncio.to_thread(rag.warmup)
+
+    app.on_startup.append(on_startup)
+    return app
+
+
+def _is_stub(llm) -> bool:
+    from functions.llm_stub import StubClient
+
+    return isinstance(llm, StubClient)
+
+
+def build_llm(kind: str, stub_delay: float, stub_fail_rate: float = 0.0):
+    """Memilih client LLM: Gemini asli atau stub lokal."""
+    if kind == "stub":
+        from functions.llm_stub import StubClient
+
+        return StubClient(first_chunk_delay=stub_delay, fail_rate=stub_fail_rate)
+    assistant.require_api_key()
+    return assistant.client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server HTTP/WebSocket untuk asisten Nara.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--llm", choices=["gemini", "stub"], default="gemini",
+                        help="Backend LLM; 'stub' untuk pengujian offline")
+    parser.add_argument("--stub-delay", type=float, default=0.2, help="Jeda chunk pertama LLM stub (detik)")
+    parser.add_argument("--stub-fail-rate", type=float, default=0.0,
+                        help="Peluang LLM stub mengembalikan error 429 (menguji retry/backoff)")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="Timeout per request (detik)")
+    parser.add_argument("--no-warmup", action="store_true", help="Jangan memuat model RAG saat startup")
+    parser.add_argument("--answer-cache", choices=["auto", "on", "off"], default="auto",
+                        help="Cache jawaban; 'auto' mematikannya untuk LLM stub")
+    args = parser.parse_args(argv)
+
+    use_answer_cache = {"auto": None, "on": True, "off": False}[args.answer_cache]
+    app = create_app(build_llm(args.llm, args.stub_delay, args.stub_fail_rate), max_concurrency=args.max_concurrency,
+                     request_timeout=args.timeout, warmup=not args.no_warmup, use_answer_cache=use_answer_cache)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import time
+
+from functions.answer_cache import AnswerCache, STALE_VERSION_GRACE
+
+
+def test_processes_on_different_versions_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    old, new = AnswerCache(path), AnswerCache(path)
+    old.put("jadwal senin", "v1", "jawaban lama")
+    new.put("jadwal senin", "v2", "jawaban baru")
+    old.put("jadwal selasa", "v1", "jawaban lama 2")
+
+    assert old.get("jadwal senin", "v1") == "jawaban lama"
+    assert new.get("jadwal senin", "v2") == "jawaban baru"
+
+
+def test_version_swap_prunes_only_stale_entries(tmp_path):
+    path = str(tmp_path / "answers.sqlite3")
+    cache = AnswerCache(path)
+    cache.put("jadwal senin", "v1", "jawaban lama")
+    cache.put("jadwal selasa", "v1", "jawaban lama 2")
+    cache._conn.execute(
+        "UPDATE answers SET last_used = ? WHERE query_norm = 'jadwal senin'",
+        (time.time() - STALE_VERSION_GRACE - 1,),
+    )
+    cache._conn.commit()
+
+    cache.put("jadwal rabu", "v2", "jawaban baru")
+
+    assert cache.get("jadwal senin", "v1") is None
+    assert cache.get("jadwal selasa", "v1") == "jawaban lama 2"
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from functions.context_packing import pack_context
+
+
+def _doc(text, source, chunk_index):
+    return SimpleNamespace(page_content=text, metadata={"source": source, "chunk_index": chunk_index})
+
+
+def test_lexical_hit_ranked_first_survives_packing():
+    # Hit leksikal (kode ruang) di posisi #1 RRF, dengan embedding yang jauh dari query dan kandidat lain
+    docs = [_doc("Ruang GK-301 dipakai untuk ujian susulan.", "ruang.txt", 0)]
+    docs += [_doc(f"Informasi umum kampus bagian {i} tentang layanan akademik.", "umum.txt", i * 5)
+             for i in range(7)]
+    vectors = {doc.page_content: [1.0 if j == i else 0.0 for j in range(len(docs))] for i, doc in enumerate(docs)}
+
+    blocks, stats = pack_context(docs, embed_documents=lambda texts: [vectors[t] for t in texts])
+
+    assert blocks[0]["content"] == docs[0].page_content
+    assert stats["chunks_used"] == 3
+
+
+def test_near_duplicate_is_replaced_by_next_candidate():
+    docs = [
+        _doc("Biaya UKT dibayar setiap awal semester.", "ukt.txt", 0),
+        _doc("Biaya UKT dibayar setiap awal semester.", "ukt_salinan.txt", 0),
+        _doc("Beasiswa prestasi dibuka pada bulan Maret.", "beasiswa.txt", 0),
+    ]
+
+    blocks, stats = pack_context(docs, max_chunks=2)
+
+    assert [block["source"] for block in blocks] == ["ukt.txt", "beasiswa.txt"]
+    assert stats["chunks_used"] == 2
@@ -0,0 +1,26 @@
+import pytest
+
+from functions.intent_router import classify_rules
+
+
+@pytest.mark.parametrize("query", [
+    "apa itu basis data",
+    "materi pemrograman web",
+    "materi kecerdasan buatan semester ini",
+])
+def test_class_name_without_schedule_cue_is_not_schedule(query):
+    assert classify_rules(query) != "schedule"
+
+
+@pytest.mark.parametrize("query", [
+    "kapan kuliah basis data",
+    "jadwal kuliah hari senin",
+    "siapa dosen jaringan komputer",
+    "basis data jam berapa",
+])
+def test_schedule_questions_route_to_schedule(query):
+    assert classify_rules(query) == "schedule"
+
+
+def test_class_name_matches_whole_words_only():
+    assert classify_rules("kapan kuliah basis datanya dibahas") is None
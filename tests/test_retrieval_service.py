@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+from functions.retrieval_service import RetrievalService, validate_request
+
+
+class FakeRag:
+    """Pengganti functions.rag: query "rusak" membuat seluruh panggilan batch gagal."""
+
+    def __init__(self):
+        self.batches = []
+
+    def retrieve_context_batch(self, queries, k=5):
+        self.batches.append(list(queries))
+        if "rusak" in queries:
+            raise RuntimeError("query rusak")
+        return [[SimpleNamespace(id=f"{query}::{i}", page_content=query, metadata={}) for i in range(k)]
+                for query in queries]
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+def _service():
+    service = RetrievalService(batch_window=0.05)
+    service.rag = FakeRag()
+    return service
+
+
+def test_bad_and_good_request_in_one_batch():
+    async def scenario():
+        service = _service()
+        service.queue = asyncio.Queue()
+        batcher = asyncio.create_task(service._batch_loop())
+        try:
+            return await asyncio.gather(
+                service._dispatch({"op": "retrieve", "queries": ["biaya ukt"], "k": "x"}),
+                service._dispatch({"op": "retrieve", "queries": "bukan daftar", "k": 2}),
+                service._dispatch({"op": "retrieve", "queries": ["jadwal krs"], "k": 2}),
+                service._dispatch({"op": "embed", "texts": ["halo"]}),
+            )
+        finally:
+            batcher.cancel()
+
+    bad_k, bad_queries, good, embed = asyncio.run(scenario())
+    assert "error" in bad_k
+    assert "error" in bad_queries
+    assert [doc["id"] for doc in good["documents"][0]] == ["jadwal krs::0", "jadwal krs::1"]
+    assert embed == {"vectors": [[4.0]]}
+
+
+def test_failing_query_does_not_fail_other_requests_in_batch():
+    service = _service()
+    requests = [
+        {"op": "retrieve", "queries": ["beasiswa"], "k": 1},
+        {"op": "retrieve", "queries": ["rusak"], "k": 1},
+        {"op": "retrieve", "queries": ["wisuda"], "k": 1},
+    ]
+
+    responses = service._process_batch(requests)
+
+    assert responses[0]["documents"][0][0]["id"] == "beasiswa::0"
+    assert responses[1] == {"error": "query rusak"}
+    assert responses[2]["documents"][0][0]["id"] == "wisuda::0"
+    assert service.rag.batches[0] == ["beasiswa", "rusak", "wisuda"]
+
+
+def test_validate_request():
+    assert validate_request({"op": "ping"}) is None
+    assert validate_request({"op": "retrieve", "queries": ["a"], "k": 3}) is None
+    assert validate_request({"op": "retrieve", "queries": ["a"], "k": True})
+    assert validate_request({"op": "embed", "texts": [1]})
+    assert validate_request(["op", "embed"])
+    assert validate_request({"op": "hapus"})
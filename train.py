@@ -1,5 +1,10 @@
 import os
 import glob
+import json
+import hashlib
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from langchain_community.document_loaders import (
     DirectoryLoader,
     PyPDFLoader,
@@ -8,8 +13,10 @@ from langchain_community.document_loaders import (
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-import shutil
+from functions.embeddings import get_embeddings, embedding_id
+from functions.bm25 import BM25Index
+from functions.flat_index import export_flat_index
+from functions import index_store
 
 # Konfigurasi
 DATA_PATH = "data"
@@ -17,6 +24,15 @@ DB_PATH = "db"
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 EMBEDDING_MODEL = "all-MiniLM-L6-v2" # Model embedding yang ringan dan efisien
+# Setiap build ditulis ke snapshot baru db/snapshots/<versi>/ lalu db/CURRENT dipindahkan
+# secara atomik (lihat functions/index_store.py). Isi snapshot:
+# - manifest.json: hash konten dan ID chunk per file, dipakai untuk re-index inkremental
+# - bm25.json: index leksikal BM25 atas chunk yang sama dengan database Chroma
+# - flat/: ekspor opsional matriks embedding float32 + tabel chunk (VECTOR_BACKEND=flat)
+# Pipeline ingestion: parsing paralel di process pool, embedding dalam batch berukuran tetap
+PARSE_WORKERS = os.cpu_count() or 1
+MAX_PENDING_FILES = 2 * PARSE_WORKERS # Batas file yang sedang/selesai di-parse tapi belum diproses
+EMBED_BATCH_SIZE = 64
 
 # Mapping ekstensi file ke loader yang sesuai
 LOADER_MAPPING = {
@@ -26,86 +42,386 @@ LOADER_MAPPING = {
     # Tambahkan loader lain jika diperlukan (misal: .docx, .csv)
 }
 
-def load_documents(source_dir: str) -> list:
-    """Memuat semua dokumen dari direktori sumber menggunakan loader yang sesuai."""
+def list_source_files(source_dir: str) -> list:
+    """Mengembalikan daftar path file (ternormalisasi, tanpa duplikat) yang didukung loader."""
     all_files = []
     for ext in LOADER_MAPPING:
         # Cari file secara rekursif di dalam direktori data
         all_files.extend(
             glob.glob(os.path.join(source_dir, f"**/*{ext}"), recursive=True)
         )
+    # Normalisasi path untuk menghindari duplikasi karena perbedaan separator
+    return sorted({os.path.normpath(file_path) for file_path in all_files})
 
-    loaded_documents = []
-    processed_files = set() # Untuk melacak file yang sudah diproses
+def file_hash(file_path: str) -> str:
+    """Menghitung hash SHA-256 dari isi file."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-    for file_path in all_files:
-        # Normalisasi path untuk menghindari duplikasi karena perbedaan separator
-        normalized_path = os.path.normpath(file_path)
-        if normalized_path in processed_files:
-            continue
+def load_file(file_path: str) -> list:
+    """Memuat satu file menggunakan loader yang sesuai dengan ekstensinya.
 
-        ext = os.path.splitext(normalized_path)[1].lower() # Pastikan ekstensi lowercase
-        if ext in LOADER_MAPPING:
-            loader_class = LOADER_MAPPING[ext]
-            try:
-                print(f"Memuat {normalized_path}...")
-                # Beberapa loader mungkin memerlukan argumen berbeda
-                if loader_class == PyPDFLoader:
-                    loader = loader_class(normalized_path)
-                else:
-                    # Asumsi loader lain menerima path saja
-                    loader = loader_class(normalized_path)
-
-                docs = loader.load()
-                # Tambahkan metadata sumber ke setiap dokumen
-                for doc in docs:
-                    doc.metadata["source"] = os.path.basename(normalized_path)
-                loaded_documents.extend(docs)
-                processed_files.add(normalized_path)
-            except Exception as e:
-                print(f"Gagal memuat {normalized_path}: {e}")
+    Mengembalikan None jika loader gagal (misalnya PDF yang terkunci atau belum selesai
+    ditulis), berbeda dengan [] untuk file yang memang tanpa isi atau tidak didukung.
+    """
+    ext = os.path.splitext(file_path)[1].lower() # Pastikan ekstensi lowercase
+    if ext not in LOADER_MAPPING:
+        print(f"Ekstensi tidak didukung: {file_path}")
+        return []
+
+    loader_class = LOADER_MAPPING[ext]
+    try:
+        print(f"Memuat {file_path}...")
+        # Beberapa loader mungkin memerlukan argumen berbeda
+        if loader_class == PyPDFLoader:
+            loader = loader_class(file_path)
         else:
-            print(f"Ekstensi tidak didukung: {normalized_path}")
+            # Asumsi loader lain menerima path saja
+            loader = loader_class(file_path)
+
+        docs = loader.load()
+        # Tambahkan metadata sumber ke setiap dokumen
+        for doc in docs:
+            doc.metadata["source"] = os.path.basename(file_path)
+        return docs
+    except Exception as e:
+        print(f"Gagal memuat {file_path}: {e}")
+        return None
 
+def load_documents(source_dir: str) -> list:
+    """Memuat semua dokumen dari direktori sumber menggunakan loader yang sesuai."""
+    loaded_documents = []
+    for _, docs in iter_loaded_files(list_source_files(source_dir)):
+        loaded_documents.extend(docs or [])
     return loaded_documents
 
-def main():
-    print("Memulai proses training data...")
+def _parse_file(file_path: str) -> tuple:
+    """Dijalankan di proses worker: memuat satu file dan mencatat durasinya."""
+    start = time.perf_counter()
+    docs = load_file(file_path)
+    return docs, time.perf_counter() - start
 
-    # 1. Muat dokumen
-    print(f"Memuat dokumen dari direktori: {DATA_PATH}")
-    documents = load_documents(DATA_PATH)
-    if not documents:
-        print("Tidak ada dokumen yang ditemukan atau berhasil dimuat. Proses dihentikan.")
+def iter_loaded_files(file_paths: list, workers: int = PARSE_WORKERS, stats: dict = None):
+    """Generator (file_path, docs) dengan parsing paralel di process pool.
+
+    Jumlah file yang sedang di-parse dibatasi MAX_PENDING_FILES sehingga pemakaian memori
+    tetap datar, dan hasil dikembalikan sesuai urutan input.
+    """
+    stats = stats if stats is not None else {}
+    workers = max(1, min(workers, len(file_paths)))
+    if workers == 1:
+        # Tidak perlu process pool untuk satu file / satu worker
+        for file_path in file_paths:
+            docs, elapsed = _parse_file(file_path)
+            stats["parse_time"] = stats.get("parse_time", 0.0) + elapsed
+            stats["files"] = stats.get("files", 0) + 1
+            yield file_path, docs
         return
-    print(f"Berhasil memuat {len(documents)} dokumen.")
 
-    # 2. Pisahkan dokumen menjadi chunk
-    print("Memisahkan dokumen menjadi chunk...")
+    max_pending = max(workers, MAX_PENDING_FILES)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        paths = iter(file_paths)
+        for file_path in paths:
+            pending.append((file_path, executor.submit(_parse_file, file_path)))
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            file_path, future = pending.pop(0)
+            docs, elapsed = future.result()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(_parse_file, next_path)))
+            stats["parse_time"] = stats.get("parse_time", 0.0) + elapsed
+            stats["files"] = stats.get("files", 0) + 1
+            yield file_path, docs
+
+def split_documents(documents: list) -> list:
+    """Memecah dokumen menjadi chunk dan menandai urutan chunk di metadata."""
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    texts = text_splitter.split_documents(documents)
-    print(f"Dokumen dipecah menjadi {len(texts)} chunk.")
-
-    # 3. Buat embedding
-    print(f"Membuat embedding menggunakan model: {EMBEDDING_MODEL}")
-    # Gunakan SentenceTransformerEmbeddings yang lebih umum
-    embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
-
-    # 4. Buat dan simpan vector store
-    # Hapus direktori DB lama jika ada untuk memastikan data baru
-    if os.path.exists(DB_PATH):
-        print(f"Menghapus direktori database lama: {DB_PATH}")
-        shutil.rmtree(DB_PATH)
-
-    print(f"Membuat dan menyimpan vector store ke: {DB_PATH}")
-    # Pastikan direktori ada sebelum menyimpan
-    os.makedirs(DB_PATH, exist_ok=True)
-    vectorstore = Chroma.from_documents(texts, embeddings, persist_directory=DB_PATH)
+    chunks = text_splitter.split_documents(documents)
+    for i, chunk in enumerate(chunks):
+        chunk.metadata["chunk_index"] = i
+    return chunks
+
+def iter_file_chunks(loaded_files, stats: dict):
+    """Tahap split: generator (file_path, chunks) dari hasil parsing per file; chunks None jika file gagal dimuat."""
+    for file_path, docs in loaded_files:
+        if docs is None:
+            stats["failed"] = stats.get("failed", 0) + 1
+            yield file_path, None
+            continue
+        start = time.perf_counter()
+        chunks = split_documents(docs)
+        stats["split_time"] = stats.get("split_time", 0.0) + time.perf_counter() - start
+        stats["chunks"] = stats.get("chunks", 0) + len(chunks)
+        yield file_path, chunks
+
+def chunk_ids(file_key: str, count: int) -> list:
+    """ID chunk deterministik per file, sehingga chunk lama bisa dihapus secara tepat."""
+    return [f"{file_key}::{i}" for i in range(count)]
+
+def load_manifest(snapshot_path: str) -> dict:
+    """Membaca manifest snapshot; mengembalikan None jika belum ada atau rusak."""
+    manifest_path = os.path.join(snapshot_path, index_store.MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Manifest tidak dapat dibaca ({e}), akan dilakukan rebuild penuh.")
+        return None
+    if manifest.get("chunk_size") != CHUNK_SIZE or manifest.get("chunk_overlap") != CHUNK_OVERLAP \
+            or manifest.get("embedding_model") != embedding_id(EMBEDDING_MODEL):
+        print("Konfigurasi chunking/embedding berubah sejak index terakhir, akan dilakukan rebuild penuh.")
+        return None
+    return manifest
+
+def save_manifest(snapshot_path: str, files: dict):
+    """Menyimpan manifest secara atomik (tulis ke file sementara lalu rename)."""
+    manifest = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": embedding_id(EMBEDDING_MODEL),
+        "files": files,
+    }
+    manifest_path = os.path.join(snapshot_path, index_store.MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def build_lexical_index(vectorstore, snapshot_path: str):
+    """Membangun ulang index BM25 dari seluruh chunk yang ada di vector store."""
+    start = time.perf_counter()
+    data = vectorstore.get(include=["documents", "metadatas"])
+    index = BM25Index.build(data["ids"], data["documents"], data["metadatas"])
+    index.save(os.path.join(snapshot_path, index_store.BM25_FILE))
+    print(f"Index BM25 dibuat: {len(index.docs)} chunk, {len(index.postings)} term "
+          f"({time.perf_counter() - start:.2f}s)")
+
+def export_flat(vectorstore, snapshot_path: str):
+    """Mengekspor seluruh embedding chunk dari Chroma ke index flat NumPy (tanpa embed ulang)."""
+    start = time.perf_counter()
+    flat_path = os.path.join(snapshot_path, index_store.FLAT_DIR)
+    data = vectorstore.get(include=["embeddings", "documents", "metadatas"])
+    export_flat_index(flat_path, data["ids"], data["embeddings"], data["documents"], data["metadatas"])
+    print(f"Index flat diekspor ke {flat_path}: {len(data['ids'])} chunk "
+          f"({time.perf_counter() - start:.2f}s)")
+
+def finalize_index(vectorstore, version: str, snapshot_path: str, with_flat: bool = False):
+    """Membangun index pendukung (BM25, flat), lalu menjadikan snapshot ini aktif.
+
+    Proses yang sedang berjalan (functions/rag.py) melihat CURRENT berubah dan berpindah
+    ke snapshot baru tanpa restart; snapshot lama di luar KEEP_SNAPSHOTS dihapus.
+    """
+    build_lexical_index(vectorstore, snapshot_path)
+    if with_flat:
+        export_flat(vectorstore, snapshot_path)
+    index_store.publish(version, DB_PATH)
+    print(f"Snapshot index aktif: {version}")
+    removed = index_store.prune(DB_PATH)
+    if removed:
+        print(f"Snapshot lama dihapus: {', '.join(removed)}")
+
+def ingest_files(vectorstore, file_paths: list, workers: int = PARSE_WORKERS, replace_ids: dict = None) -> tuple:
+    """Pipeline parse -> split -> embed untuk sekumpulan file.
+
+    Parsing berjalan di process pool sementara proses utama memecah dan meng-embed hasil
+    sebelumnya; chunk dikirim ke vector store dalam batch berukuran EMBED_BATCH_SIZE.
+    replace_ids (file_key -> ID chunk lama) dihapus hanya setelah file itu berhasil dimuat,
+    sehingga file yang gagal tetap memakai chunk lamanya.
+    Mengembalikan (ID chunk per file yang berhasil, daftar file_key yang gagal dimuat).
+    """
+    replace_ids = replace_ids or {}
+    stats = {}
+    start = time.perf_counter()
+    ids_per_file = {}
+    failed = []
+    batch_docs, batch_ids = [], []
+
+    def flush():
+        if not batch_docs:
+            return
+        embed_start = time.perf_counter()
+        vectorstore.add_documents(batch_docs, ids=batch_ids)
+        stats["embed_time"] = stats.get("embed_time", 0.0) + time.perf_counter() - embed_start
+        batch_docs.clear()
+        batch_ids.clear()
+
+    loaded = iter_loaded_files(file_paths, workers=workers, stats=stats)
+    for file_path, chunks in iter_file_chunks(loaded, stats):
+        file_key = os.path.relpath(file_path, DATA_PATH)
+        if chunks is None:
+            failed.append(file_key)
+            continue
+        if replace_ids.get(file_key):
+            # ID chunk deterministik: chunk lama harus dihapus sebelum yang baru ditambahkan
+            vectorstore.delete(ids=replace_ids[file_key])
+        ids = chunk_ids(file_key, len(chunks))
+        ids_per_file[file_key] = ids
+        for chunk, chunk_id in zip(chunks, ids):
+            batch_docs.append(chunk)
+            batch_ids.append(chunk_id)
+            if len(batch_docs) >= EMBED_BATCH_SIZE:
+                flush()
+    flush()
+
+    stats["wall_time"] = time.perf_counter() - start
+    print_ingest_stats(stats)
+    if failed:
+        print(f"Gagal dimuat ({len(failed)} file, dicoba lagi pada run berikutnya): {', '.join(failed)}")
+    return ids_per_file, failed
+
+def print_ingest_stats(stats: dict):
+    """Menampilkan throughput per tahap pipeline ingestion."""
+    def rate(count, seconds):
+        return count / seconds if seconds > 0 else 0.0
+
+    files = stats.get("files", 0)
+    chunks = stats.get("chunks", 0)
+    print("Statistik ingestion:")
+    print(f"  Parse : {files} file, {stats.get('parse_time', 0.0):.2f}s CPU worker "
+          f"({rate(files, stats.get('parse_time', 0.0)):.2f} file/s per worker)")
+    print(f"  Split : {chunks} chunk, {stats.get('split_time', 0.0):.2f}s "
+          f"({rate(chunks, stats.get('split_time', 0.0)):.1f} chunk/s)")
+    print(f"  Embed : {chunks} chunk, {stats.get('embed_time', 0.0):.2f}s "
+          f"({rate(chunks, stats.get('embed_time', 0.0)):.1f} chunk/s)")
+    print(f"  Total : {stats.get('wall_time', 0.0):.2f}s "
+          f"({rate(files, stats.get('wall_time', 0.0)):.2f} file/s, "
+          f"{rate(chunks, stats.get('wall_time', 0.0)):.1f} chunk/s)")
+    if stats.get("failed"):
+        print(f"  Gagal : {stats['failed']} file")
+
+def full_rebuild(embeddings, files: list, workers: int = PARSE_WORKERS, with_flat: bool = False):
+    """Membangun index dari semua file ke snapshot baru; index aktif tidak disentuh sampai selesai."""
+    version, snapshot_path = index_store.create_snapshot(DB_PATH)
+    print(f"Membuat dan menyimpan vector store ke: {snapshot_path}")
     # Chroma otomatis persist jika persist_directory diberikan saat inisialisasi
-    # vectorstore.persist() # Tidak perlu dipanggil lagi
-    print("Vector store berhasil dibuat dan disimpan.")
+    vectorstore = Chroma(persist_directory=snapshot_path, embedding_function=embeddings)
+
+    ids_per_file, failed = ingest_files(vectorstore, files, workers=workers)
+    manifest_files = {}
+    total_chunks = 0
+    for file_path in files:
+        file_key = os.path.relpath(file_path, DATA_PATH)
+        if file_key not in ids_per_file:
+            # Tanpa entri manifest, file yang gagal dimuat dianggap baru dan dicoba lagi
+            continue
+        ids = ids_per_file[file_key]
+        manifest_files[file_key] = {"hash": file_hash(file_path), "chunk_ids": ids}
+        total_chunks += len(ids)
+
+    save_manifest(snapshot_path, manifest_files)
+    finalize_index(vectorstore, version, snapshot_path, with_flat=with_flat)
+    print(f"Index dibangun ulang: {len(manifest_files)} file, {total_chunks} chunk"
+          + (f", {len(failed)} file gagal dimuat." if failed else "."))
+
+def incremental_update(embeddings, files: list, manifest: dict, workers: int = PARSE_WORKERS,
+                       with_flat: bool = False):
+    """Hanya memproses file yang ditambah, diubah, atau dihapus sejak index terakhir.
+
+    Perubahan diterapkan pada salinan snapshot aktif, bukan pada snapshot aktif itu sendiri.
+    File yang berubah tetapi gagal dimuat mempertahankan chunk dan entri manifest lamanya,
+    sehingga dicoba lagi pada run berikutnya.
+    """
+    old_files = manifest.get("files", {})
+    current = {os.path.relpath(path, DATA_PATH): path for path in files}
+
+    added, changed, unchanged = [], [], []
+    new_hashes = {}
+    for file_key, file_path in current.items():
+        new_hashes[file_key] = file_hash(file_path)
+        if file_key not in old_files:
+            added.append(file_key)
+        elif old_files[file_key].get("hash") != new_hashes[file_key]:
+            changed.append(file_key)
+        else:
+            unchanged.append(file_key)
+    deleted = [file_key for file_key in old_files if file_key not in current]
+
+    print(f"Perubahan: {len(added)} baru, {len(changed)} berubah, {len(deleted)} dihapus, {len(unchanged)} tetap.")
+    current_path = index_store.current_snapshot_dir(DB_PATH)
+    missing_side_index = not os.path.exists(os.path.join(current_path, index_store.BM25_FILE)) or \
+        (with_flat and not os.path.exists(os.path.join(current_path, index_store.FLAT_DIR)))
+    if not (added or changed or deleted or missing_side_index):
+        print("Index sudah up to date, tidak ada yang perlu diproses.")
+        return
+
+    version, snapshot_path = index_store.create_snapshot(DB_PATH, copy_from=current_path)
+    print(f"Memperbarui salinan index di: {snapshot_path}")
+    vectorstore = Chroma(persist_directory=snapshot_path, embedding_function=embeddings)
+
+    # Hapus chunk lama milik file yang dihapus; chunk file yang berubah diganti saat file itu berhasil dimuat
+    stale_ids = []
+    for file_key in deleted:
+        stale_ids.extend(old_files[file_key].get("chunk_ids", []))
+    if stale_ids:
+        print(f"Menghapus {len(stale_ids)} chunk lama...")
+        vectorstore.delete(ids=stale_ids)
+
+    manifest_files = {file_key: old_files[file_key] for file_key in unchanged}
+    replace_ids = {file_key: old_files[file_key].get("chunk_ids", []) for file_key in changed}
+    ids_per_file, failed = ingest_files(vectorstore, [current[key] for key in added + changed], workers=workers,
+                                        replace_ids=replace_ids)
+    for file_key in added + changed:
+        if file_key in ids_per_file:
+            ids = ids_per_file[file_key]
+            manifest_files[file_key] = {"hash": new_hashes[file_key], "chunk_ids": ids}
+            print(f"  {file_key}: {len(ids)} chunk di-index.")
+        elif file_key in old_files:
+            manifest_files[file_key] = old_files[file_key]
+            print(f"  {file_key}: gagal dimuat, chunk lama dipertahankan.")
+        else:
+            print(f"  {file_key}: gagal dimuat, belum di-index.")
+
+    save_manifest(snapshot_path, manifest_files)
+    finalize_index(vectorstore, version, snapshot_path, with_flat=with_flat)
+    print("Index berhasil diperbarui secara inkremental.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Membangun index vector store dari direktori data.")
+    parser.add_argument("--full", action="store_true",
+                        help="Bangun ulang seluruh index ke snapshot baru (tanpa manifest lama)")
+    parser.add_argument("--export-flat", action="store_true",
+                        help="Ekspor juga index flat NumPy (otomatis jika sudah pernah diekspor)")
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS,
+                        help="Jumlah proses paralel untuk parsing dokumen")
+    args = parser.parse_args(argv)
+
+    print("Memulai proses training data...")
+
+    # 1. Cari dokumen
+    print(f"Memindai dokumen dari direktori: {DATA_PATH}")
+    files = list_source_files(DATA_PATH)
+    if not files:
+        print("Tidak ada dokumen yang ditemukan. Proses dihentikan.")
+        return
+    print(f"Ditemukan {len(files)} file.")
+
+    # 2. Siapkan embedding
+    print(f"Membuat embedding menggunakan model: {embedding_id(EMBEDDING_MODEL)}")
+    # Embedding dibungkus cache di disk: chunk yang isinya tidak berubah tidak di-embed ulang
+    embeddings = get_embeddings(EMBEDDING_MODEL)
+
+    # 3. Perbarui vector store: inkremental jika manifest tersedia, selain itu rebuild penuh
+    # Index flat yang sudah pernah diekspor selalu diperbarui agar tidak basi
+    current_path = index_store.current_snapshot_dir(DB_PATH)
+    with_flat = args.export_flat or os.path.exists(os.path.join(current_path, index_store.FLAT_DIR))
+    # Layout lama (tanpa snapshot) selalu dibangun ulang ke snapshot pertama
+    manifest = None
+    if not args.full and index_store.has_snapshots(DB_PATH):
+        manifest = load_manifest(current_path)
+    if manifest is None:
+        full_rebuild(embeddings, files, workers=args.workers, with_flat=with_flat)
+    else:
+        incremental_update(embeddings, files, manifest, workers=args.workers, with_flat=with_flat)
 
     print("Proses training data selesai.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -12,6 +12,7 @@ pip install google-genai pyaudio
 """
 
 import os
+import time
 import asyncio
 import traceback
 
@@ -22,6 +23,8 @@ import argparse
 from google import genai
 from google.genai import types
 
+from functions.tracing import observe, increment, log_event
+
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 SEND_SAMPLE_RATE = 16000
@@ -63,6 +66,7 @@ class AudioLoop:
         self.send_text_task = None
         self.receive_audio_task = None
         self.play_audio_task = None
+        self.last_sent_at = None # Waktu teks terakhir dikirim, untuk mengukur latensi jawaban
 
     async def send_text(self):
         while True:
@@ -73,6 +77,7 @@ class AudioLoop:
             if text.lower() == "q":
                 break
             await self.session.send(input=text or ".", end_of_turn=True)
+            self.last_sent_at = time.perf_counter()
 
     async def send_realtime(self):
         while True:
@@ -102,12 +107,26 @@ class AudioLoop:
         "Background task to reads from the websocket and write pcm chunks to the output queue"
         while True:
             turn = self.session.receive()
+            first_response = None
+            audio_chunks = 0
             async for response in turn:
+                if first_response is None:
+                    first_response = time.perf_counter()
+                    if self.last_sent_at is not None:
+                        observe("voice_first_response_seconds", first_response - self.last_sent_at)
+                        self.last_sent_at = None
                 if data := response.data:
+                    audio_chunks += 1
                     self.audio_in_queue.put_nowait(data)
                     continue
                 if text := response.text:
                     print(text, end="")
+            if first_response is not None:
+                turn_seconds = time.perf_counter() - first_response
+                observe("voice_turn_seconds", turn_seconds)
+                increment("voice_turns")
+                log_event({"ts": time.time(), "event": "voice_turn", "duration_ms": round(turn_seconds * 1000, 3),
+                           "audio_chunks": audio_chunks, "queued_audio": self.audio_in_queue.qsize()})
 
             # If you interrupt the model, it sends a turn_complete.
             # For interruptions to work, we need to stop playback.
@@ -126,7 +145,9 @@ class AudioLoop:
         )
         while True:
             bytestream = await self.audio_in_queue.get()
+            start = time.perf_counter()
             await asyncio.to_thread(stream.write, bytestream)
+            observe("voice_play_write_seconds", time.perf_counter() - start)
 
     async def run(self):
         try: